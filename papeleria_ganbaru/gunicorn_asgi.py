@@ -0,0 +1,25 @@
+"""
+Perfil de despliegue ASGI (alternativo): gunicorn como gestor de procesos
+con workers de uvicorn. Para usarlo, cambiar el comando de inicio (Render /
+Procfile), que por defecto sigue siendo `gunicorn papeleria_ganbaru.wsgi`:
+
+    gunicorn papeleria_ganbaru.asgi -c papeleria_ganbaru/gunicorn_asgi.py
+
+Activa TIENDA_ASGI (vistas de tienda/views_async.py, sin conexiones
+persistentes). `manage.py bench_asgi` compara este perfil con el WSGI.
+
+No es el de por defecto porque con ASGI:
+  - las exportaciones del panel (exportar.respuesta) son generadores sync y
+    Django los junta enteros en memoria antes de mandar el primer byte;
+  - MetricasMiddleware es solo sync: obliga a adaptar cada request y no ve
+    las consultas de las vistas async.
+"""
+import os
+
+os.environ.setdefault("TIENDA_ASGI", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 30
+graceful_timeout = 20
@@ -40,10 +40,12 @@ INSTALLED_APPS = [
 
 # ====== Middleware ======
 MIDDLEWARE = [
+    "tienda.metricas.MetricasMiddleware",  # se descarta solo si TIENDA_METRICAS está apagado
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # estáticos en prod
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "tienda.replicas.ReplicaMiddleware",  # solo con réplica (TIENDA_REPLICA)
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -72,6 +74,11 @@ WSGI_APPLICATION = "papeleria_ganbaru.wsgi.application"
 
 # ====== Base de datos ======
 # Por defecto SQLite (dev local)
+# Servido con ASGI (perfil opcional gunicorn + uvicorn, ver gunicorn_asgi.py;
+# el Procfile usa WSGI): inicio, la ficha de producto y el carrito usan las
+# vistas de tienda/views_async.py.
+TIENDA_ASGI = os.environ.get("TIENDA_ASGI", "0") == "1"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
@@ -89,10 +96,64 @@ if os.environ.get("DATABASE_URL"):
 
     DATABASES["default"] = dj_database_url.config(
         default=url,
-        conn_max_age=600,
+        # con ASGI cada request corre sus consultas en un hilo propio: las
+        # conexiones persistentes quedarían abiertas por hilo, así que se cierran
+        conn_max_age=0 if TIENDA_ASGI else 600,
         ssl_require=not is_local,   # ← True en Render, False en local
     )
 
+# Réplica de solo lectura (opcional): las vistas marcadas con @solo_lectura
+# (catálogo, perfil, listados y reportes del panel) leen de acá; el checkout y
+# los cambios del panel van a la principal. Ver tienda/replicas.py.
+TIENDA_REPLICA = bool(os.environ.get("DATABASE_REPLICA_URL"))
+# segundos que un cliente sigue leyendo de la principal después de escribir
+TIENDA_REPLICA_FIJAR = int(os.environ.get("TIENDA_REPLICA_FIJAR", "5"))
+
+if TIENDA_REPLICA:
+    url = os.environ["DATABASE_REPLICA_URL"]
+    DATABASES["replica"] = dj_database_url.config(
+        default=url,
+        conn_max_age=0 if TIENDA_ASGI else 600,
+        ssl_require=not (("localhost" in url) or ("127.0.0.1" in url)),
+    )
+    # en los tests no hay replicación: la "réplica" es la misma base de prueba
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["tienda.replicas.RouterReplica"]
+
+# ====== Caché ======
+# Por defecto memoria local (un proceso). Con varios workers de gunicorn conviene
+# REDIS_URL para que las invalidaciones de fragmentos se vean en todos.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "ganbaru",
+        }
+    }
+
+# ====== Sesiones ======
+# SESSION_BACKEND: "db" (por defecto), "cached_db" (lee de la caché y escribe en
+# la base), "cache" (solo caché; se pierde si la caché se vacía) o
+# "signed_cookies" (todo en la cookie firmada, sin tocar la base). Con
+# "signed_cookies" una cookie vieja puede reenviarse, así que el token del
+# checkout solo evita dobles envíos dentro de la misma sesión de navegador.
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "db")
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
 # ====== Archivos estáticos ======
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -115,6 +176,34 @@ else:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
 
+# ====== Tienda ======
+# Reserva de stock en el checkout: "bloqueo" (SELECT ... FOR UPDATE) o
+# "condicional" (UPDATE ... WHERE stock >= n, sin bloquear filas de antemano)
+TIENDA_RESERVA_STOCK = os.environ.get("TIENDA_RESERVA_STOCK", "bloqueo")
+
+# Cola de tareas (tienda/tareas.py): en producción las ejecuta `manage.py run_worker`.
+# Con "1" se ejecutan en el momento, dentro del request (útil sin worker).
+TIENDA_TAREAS_SINCRONAS = os.environ.get("TIENDA_TAREAS_SINCRONAS", "0") == "1"
+
+# Dónde vive el carrito: "session" (dentro de la sesión) o "cache" (en la caché
+# TIENDA_CART_CACHE; la sesión solo guarda un id). Con varios workers, "cache"
+# necesita un backend compartido (REDIS_URL).
+TIENDA_CART_STORE = os.environ.get("TIENDA_CART_STORE", "session")
+TIENDA_CART_CACHE = "default"
+
+# Caché de páginas completas (inicio y ficha de producto) para visitantes
+# anónimos; ver tienda/cache_paginas.py. Con "1" el token CSRF de los
+# formularios de compra se pide a /csrf/ recién al enviarlos.
+TIENDA_CACHE_ANONIMA = os.environ.get("TIENDA_CACHE_ANONIMA", "0") == "1"
+TIENDA_CACHE_ANONIMA_TTL = int(os.environ.get("TIENDA_CACHE_ANONIMA_TTL", "60"))
+
+# Métricas por vista (tienda/metricas.py): cabecera Server-Timing, /panel/metrics/
+# y /metrics para Prometheus (staff o "Authorization: Bearer <token>").
+# Apagado no agrega nada al request.
+TIENDA_METRICAS = os.environ.get("TIENDA_METRICAS", "0") == "1"
+TIENDA_METRICAS_TOKEN = os.environ.get("TIENDA_METRICAS_TOKEN", "")
+TIENDA_METRICAS_SQL_LENTA_MS = int(os.environ.get("TIENDA_METRICAS_SQL_LENTA_MS", "100"))
+
 # ====== Seguridad detrás de proxy (Render) ======
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
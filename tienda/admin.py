@@ -1,24 +1,92 @@
-from django.contrib import admin
+from decimal import Decimal, InvalidOperation
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.admin.sites import NotRegistered
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Producto, Pedido, DetallePedido, Descuento, Categoria
+from . import ajustes, resumenes
+from .imagenes import url_miniatura
+from .models import Producto, Pedido, DetallePedido, Descuento, Categoria, Tarea
 
 # --- Categoria ---
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
-    list_display = ("nombre", "slug")
+    list_display = ("nombre", "slug", "productos_disponibles", "precio_min", "precio_max")
+    readonly_fields = ("productos_disponibles", "precio_min", "precio_max")
     prepopulated_fields = {"slug": ("nombre",)}
 
 # --- Producto ---
+class AjusteActionForm(ActionForm):
+    valor = forms.CharField(required=False, label="Valor", widget=forms.TextInput(attrs={"size": 6}))
+
+
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ("thumb", "nombre", "precio", "stock", "disponible", "categoria", "creado")
     list_filter = ("disponible", "categoria")
+    list_select_related = ("categoria",)
     search_fields = ("nombre", "descripcion")
     fields = ("nombre", "descripcion", "resumen", "precio", "stock", "disponible", "categoria", "imagen")
+    action_form = AjusteActionForm
+    actions = ["ajustar_precio", "fijar_stock", "sumar_stock", "activar", "desactivar"]
+
+    # Las acciones usan tienda.ajustes: un UPDATE por acción, sin save() por fila.
+    def _valor(self, request, entero):
+        texto = request.POST.get("valor", "").strip().replace(",", ".")
+        try:
+            valor = Decimal(texto)
+        except InvalidOperation:
+            valor = None
+        if valor is None or (entero and valor != valor.to_integral_value()):
+            self.message_user(request, "Indique un número válido en «Valor».", messages.ERROR)
+            return None
+        return int(valor) if entero else valor
+
+    @admin.action(description="Ajustar precio en Valor %%")
+    def ajustar_precio(self, request, queryset):
+        pct = self._valor(request, entero=False)
+        if pct is None:
+            return
+        try:
+            n = ajustes.ajustar_precios(queryset, pct)
+        except ValueError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(request, f"Precio ajustado en {n} producto(s).")
+
+    @admin.action(description="Fijar stock en Valor")
+    def fijar_stock(self, request, queryset):
+        n = self._valor(request, entero=True)
+        if n is None:
+            return
+        if n < 0:
+            self.message_user(request, "El stock no puede ser negativo.", messages.ERROR)
+            return
+        total = ajustes.ajustar_stock(dict.fromkeys(queryset.values_list("id", flat=True), n))
+        self.message_user(request, f"Stock fijado en {total} producto(s).")
+
+    @admin.action(description="Sumar Valor al stock")
+    def sumar_stock(self, request, queryset):
+        n = self._valor(request, entero=True)
+        if n is None:
+            return
+        total = ajustes.ajustar_stock(dict.fromkeys(queryset.values_list("id", flat=True), n), sumar=True)
+        self.message_user(request, f"Stock actualizado en {total} producto(s).")
+
+    @admin.action(description="Activar (solo con stock)")
+    def activar(self, request, queryset):
+        n = ajustes.cambiar_disponibilidad(queryset, True)
+        self.message_user(request, f"{n} producto(s) activados.")
+
+    @admin.action(description="Desactivar")
+    def desactivar(self, request, queryset):
+        n = ajustes.cambiar_disponibilidad(queryset, False)
+        self.message_user(request, f"{n} producto(s) desactivados.")
 
     def thumb(self, obj):
         if getattr(obj, "imagen", None):
-            return format_html('<img src="{}" style="height:40px;border-radius:6px"/>', obj.imagen.url)
+            return format_html('<img src="{}" style="height:40px;border-radius:6px"/>', url_miniatura(obj))
         return "—"
     thumb.short_description = "Imagen"
 
@@ -36,18 +104,50 @@ class DetalleInline(admin.TabularInline):
     readonly_fields = ("precio_unitario",)
     fields = ("producto", "cantidad", "precio_unitario")
 
+    def get_queryset(self, request):
+        # DetallePedido.__str__ usa producto.nombre
+        return super().get_queryset(request).select_related("producto")
+
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
     list_display = ("id", "usuario", "estado", "creado", "total")
     list_filter = ("estado", "creado")
+    list_select_related = ("usuario",)
     search_fields = ("id", "usuario__username")
     readonly_fields = ("total",)
     fields = ("usuario", "estado", "descuento", "total")
     inlines = [DetalleInline]
 
+    # estado, cupón y líneas pueden cambiar: se reemplaza la huella del pedido
+    # en los resúmenes de ventas una vez guardadas también las líneas
+    def save_model(self, request, obj, form, change):
+        obj._huella_antes = resumenes.huella_guardada(obj.pk) if change else None
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        pedido = form.instance
+        pedido._prefetched_objects_cache = {}
+        resumenes.actualizar_pedido(pedido._huella_antes, pedido)
+
 # --- Descuento ---
 @admin.register(Descuento)
 class DescuentoAdmin(admin.ModelAdmin):
     list_display = ("codigo", "porcentaje", "activo", "creado")
     list_filter = ("activo",)
     search_fields = ("codigo",)
+
+# --- Cola de tareas ---
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ("id", "nombre", "estado", "intentos", "ejecutar_desde", "terminado")
+    list_filter = ("estado", "nombre")
+    readonly_fields = ("intentos", "tomada", "ultimo_error", "creado", "terminado")
+    actions = ["reintentar"]
+
+    @admin.action(description="Reintentar ahora")
+    def reintentar(self, request, queryset):
+        n = queryset.exclude(estado=Tarea.EN_CURSO).update(
+            estado=Tarea.PENDIENTE, intentos=0, ejecutar_desde=timezone.now(), terminado=None
+        )
+        self.message_user(request, f"{n} tarea(s) vueltas a la cola.")
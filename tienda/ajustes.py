@@ -0,0 +1,120 @@
+"""
+Ajustes masivos del catálogo (panel y acciones del admin).
+
+Cada operación es un único UPDATE con expresiones F()/Case sobre el
+conjunto de productos, sin cargar ni guardar fila por fila: solo se leen
+antes sus ids, para el aviso.
+Mantienen el invariante del modelo (sin stock → no disponible), marcan
+`actualizado` y avisan una sola vez con `productos_actualizados_en_bloque`.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.functions import Greatest, Round
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+from .models import Producto
+from .signals import productos_actualizados_en_bloque
+
+DECIMALES_PRECIO = 0   # pesos chilenos: el precio ajustado se redondea al peso
+PORCENTAJE_MIN, PORCENTAJE_MAX = -90, 500
+
+
+def _avisar(n, ids, campos):
+    if n:
+        productos_actualizados_en_bloque.send(sender=Producto, ids=ids, campos=campos, using="default")
+
+
+def _ids(qs):
+    """
+    Ids de `qs`, leídos (y bloqueados) antes del UPDATE: después el filtro
+    original puede dejar de cumplirse (un rango de precio, disponible=False).
+    El UPDATE va sobre estos mismos ids, así que el aviso cubre justo lo tocado.
+    """
+    return list(qs.select_for_update(of=("self",)).order_by().values_list("pk", flat=True))
+
+
+def ajustar_precios(qs, porcentaje):
+    """Sube (o baja, si es negativo) el precio de `qs` en `porcentaje` %. Devuelve cuántos cambió."""
+    porcentaje = Decimal(porcentaje)
+    if not PORCENTAJE_MIN <= porcentaje <= PORCENTAJE_MAX:
+        raise ValueError(f"El porcentaje debe estar entre {PORCENTAJE_MIN} y {PORCENTAJE_MAX}.")
+    factor = (Decimal(100) + porcentaje) / Decimal(100)
+
+    with transaction.atomic():
+        ids = _ids(qs)
+        n = Producto.objects.filter(pk__in=ids).update(
+            precio=Round(F("precio") * Value(factor), DECIMALES_PRECIO), actualizado=timezone.now(),
+        )
+        _avisar(n, ids, ["precio"])
+    return n
+
+
+def ajustar_stock(cantidades, sumar=False):
+    """
+    `cantidades` es {id_producto: n}. Con sumar=False el stock queda en n;
+    con sumar=True se le suma n (puede ser negativo, nunca baja de 0).
+
+    Un producto que queda sin stock pasa a no disponible; uno que estaba
+    agotado (stock 0) y recibe unidades vuelve a estar disponible. Los
+    desactivados a mano con stock siguen como estaban.
+    """
+    if not cantidades:
+        return 0
+    if sumar:
+        nuevo = Case(
+            *[When(id=pid, then=Greatest(F("stock") + Value(n), Value(0))) for pid, n in cantidades.items()],
+            output_field=PositiveIntegerField(),
+        )
+    else:
+        if any(n < 0 for n in cantidades.values()):
+            raise ValueError("El stock no puede ser negativo.")
+        nuevo = Case(
+            *[When(id=pid, then=Value(n)) for pid, n in cantidades.items()],
+            output_field=PositiveIntegerField(),
+        )
+
+    ids = list(cantidades)
+    with transaction.atomic():
+        # en el UPDATE, `stock` del lado derecho es siempre el valor anterior
+        n = Producto.objects.filter(id__in=ids).update(
+            stock=nuevo,
+            disponible=Case(
+                When(Exact(nuevo, 0), then=Value(False)),
+                When(stock=0, then=Value(True)),
+                default=F("disponible"),
+            ),
+            actualizado=timezone.now(),
+        )
+        _avisar(n, ids, ["stock", "disponible"])
+    return n
+
+
+def cambiar_disponibilidad(qs, disponible):
+    """Activa o desactiva `qs`. Los productos sin stock no se activan."""
+    if disponible:
+        qs = qs.filter(stock__gt=0)
+    with transaction.atomic():
+        ids = _ids(qs.exclude(disponible=disponible))
+        n = Producto.objects.filter(pk__in=ids).update(disponible=disponible, actualizado=timezone.now())
+        _avisar(n, ids, ["disponible"])
+    return n
+
+
+def resolver_productos(referencias):
+    """
+    {referencia: id} para una lista de ids o nombres exactos, con una sola
+    consulta. Las referencias desconocidas no aparecen en el resultado.
+    """
+    ids = {r for r in referencias if str(r).isdigit()}
+    nombres = set(referencias) - ids
+    encontrados = Producto.objects.filter(id__in=[int(i) for i in ids]) | Producto.objects.filter(nombre__in=nombres)
+    resultado = {}
+    for pid, nombre in encontrados.values_list("id", "nombre"):
+        if str(pid) in ids:
+            resultado[str(pid)] = pid
+        if nombre in nombres:
+            resultado[nombre] = pid
+    return resultado
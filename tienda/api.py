@@ -0,0 +1,209 @@
+"""
+API JSON de solo lectura del catálogo (app móvil y barra de filtros).
+
+  GET /api/productos/            mismos filtros y orden que inicio (?q, cat, ok,
+                                 pmin, pmax, ord), ?cursor= y ?limite= (máx. 100)
+  GET /api/productos/<id>/
+  GET /api/categorias/
+
+?fields=id,nombre,precio elige los campos (ver CAMPOS_PRODUCTO).
+
+Cada respuesta lleva ETag (y Last-Modified en el detalle de un producto).
+El validador sale de los datos con una consulta barata (Max(actualizado) +
+Count del listado filtrado o de las categorías, o el `actualizado` del
+producto y su categoría); si el cliente ya lo tiene se responde 304 sin
+cargar la página ni serializar nada. Los listados no llevan Last-Modified:
+una fecha no cambia cuando un producto se borra o sale del filtro, y con
+If-Modified-Since el cliente recibiría un 304 viejo.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+
+from . import imagenes, versiones
+from .filtros import filtrar_catalogo
+from .models import Categoria, Producto
+from .paginacion import paginar_keyset
+from .replicas import solo_lectura
+
+POR_PAGINA = 24
+POR_PAGINA_MAX = 100
+
+# campo de la API → columnas que necesita del modelo
+CAMPOS_PRODUCTO = {
+    "id": [],
+    "nombre": ["nombre"],
+    "resumen": ["resumen"],
+    "descripcion": ["descripcion"],
+    "precio": ["precio"],
+    "stock": ["stock"],
+    "disponible": ["disponible"],
+    "categoria": ["categoria__slug", "categoria__nombre"],
+    "imagen": ["imagen", "imagen_derivados"],
+    "creado": ["creado"],
+    "actualizado": ["actualizado"],
+}
+CAMPOS_LISTADO = ["id", "nombre", "resumen", "precio", "disponible", "categoria", "imagen"]
+CAMPOS_DETALLE = list(CAMPOS_PRODUCTO)
+
+
+class CamposInvalidos(ValueError):
+    pass
+
+
+def _error(mensaje, status):
+    return JsonResponse({"error": mensaje}, status=status)
+
+
+def _campos(request, por_defecto):
+    valor = request.GET.get("fields", "").strip()
+    if not valor:
+        return por_defecto
+    campos = [c.strip() for c in valor.split(",") if c.strip()]
+    desconocidos = [c for c in campos if c not in CAMPOS_PRODUCTO]
+    if desconocidos:
+        raise CamposInvalidos(f"Campos desconocidos: {', '.join(desconocidos)}")
+    return campos
+
+
+def _columnas(campos, *extra):
+    columnas = {col for c in campos for col in CAMPOS_PRODUCTO[c]} | set(extra)
+    return sorted(columnas)
+
+
+def _etag(*partes):
+    return '"' + hashlib.md5(repr(partes).encode()).hexdigest() + '"'
+
+
+def _condicional(request, etag, ultima=None):
+    """Respuesta 304 (con sus validadores) si el cliente ya tiene esta versión, o None."""
+    respuesta = get_conditional_response(
+        request, etag=etag, last_modified=int(ultima.timestamp()) if ultima else None,
+    )
+    return _con_validadores(respuesta, etag, ultima) if respuesta is not None else None
+
+
+def _con_validadores(respuesta, etag, ultima=None):
+    respuesta["ETag"] = etag
+    if ultima:
+        respuesta["Last-Modified"] = http_date(ultima.timestamp())
+    # el cliente puede guardarla, pero revalida siempre con If-None-Match
+    patch_cache_control(respuesta, max_age=0, must_revalidate=True)
+    return respuesta
+
+
+# --------- SERIALIZACIÓN ----------
+def _imagen(p):
+    if not p.imagen:
+        return None
+    return {
+        "url": p.imagen.url,
+        "miniatura": imagenes.url_miniatura(p),
+        "srcset_avif": imagenes.srcset(p, "avif"),
+        "srcset_webp": imagenes.srcset(p, "webp"),
+    }
+
+
+def _producto(p, campos):
+    valores = {
+        "id": lambda: p.id,
+        "nombre": lambda: p.nombre,
+        "resumen": lambda: p.resumen,
+        "descripcion": lambda: p.descripcion,
+        "precio": lambda: p.precio,
+        "stock": lambda: p.stock,
+        "disponible": lambda: p.disponible,
+        "categoria": lambda: {"slug": p.categoria.slug, "nombre": p.categoria.nombre} if p.categoria_id else None,
+        "imagen": lambda: _imagen(p),
+        "creado": lambda: p.creado,
+        "actualizado": lambda: p.actualizado,
+    }
+    return {c: valores[c]() for c in campos}
+
+
+# --------- VISTAS ----------
+@require_GET
+@solo_lectura
+def productos(request):
+    try:
+        campos = _campos(request, CAMPOS_LISTADO)
+    except CamposInvalidos as e:
+        return _error(str(e), 400)
+    try:
+        limite = min(max(int(request.GET.get("limite", POR_PAGINA)), 1), POR_PAGINA_MAX)
+    except ValueError:
+        return _error("`limite` debe ser un número.", 400)
+
+    qs, f = filtrar_catalogo(request.GET)
+
+    # validador: cambia si se edita, agrega, borra o sale del filtro algún
+    # producto del listado (o, si se muestra, alguna de sus categorías)
+    agregados = {"ultima": Max("actualizado"), "n": Count("id")}
+    if "categoria" in campos:
+        agregados["ultima_categoria"] = Max("categoria__actualizado")
+    estado = qs.order_by().aggregate(**agregados)
+    etag = _etag(sorted(request.GET.lists()), *sorted(estado.items()))
+    no_cambio = _condicional(request, etag)
+    if no_cambio is not None:
+        return no_cambio
+
+    if "categoria" in campos:
+        qs = qs.select_related("categoria")
+    # el campo de orden hace falta para armar los cursores (relevancia es una anotación)
+    orden = f["orden"].lstrip("-")
+    qs = qs.only(*_columnas(campos, *([orden] if orden != "relevancia" else [])))
+    pagina = paginar_keyset(qs, f["orden"], cursor=request.GET.get("cursor"), por_pagina=limite)
+
+    return _con_validadores(JsonResponse({
+        "resultados": [_producto(p, campos) for p in pagina],
+        "siguiente": pagina.siguiente,
+        "anterior": pagina.anterior,
+        "total": estado["n"],
+    }), etag)
+
+
+@require_GET
+@solo_lectura
+def producto(request, pk):
+    try:
+        campos = _campos(request, CAMPOS_DETALLE)
+    except CamposInvalidos as e:
+        return _error(str(e), 400)
+
+    # igual que la ficha HTML: los productos no disponibles no se muestran
+    p = Producto.objects.select_related("categoria").filter(pk=pk, disponible=True).first()
+    if p is None:
+        return _error("Producto no encontrado.", 404)
+
+    # renombrar la categoría también cambia la respuesta
+    ultima = max(p.actualizado, p.categoria.actualizado) if p.categoria_id else p.actualizado
+    etag = _etag(p.pk, ultima, campos)
+    no_cambio = _condicional(request, etag, ultima)
+    if no_cambio is not None:
+        return no_cambio
+    return _con_validadores(JsonResponse(_producto(p, campos)), etag, ultima)
+
+
+@require_GET
+@solo_lectura
+def categorias(request):
+    # sale de los datos (igual en todos los workers); los recuentos de
+    # contadores.py también marcan `actualizado`
+    etag = _etag("categorias", versiones.categorias())
+    no_cambio = _condicional(request, etag)
+    if no_cambio is not None:
+        return no_cambio
+
+    datos = [
+        {
+            "slug": c.slug, "nombre": c.nombre, "miniatura": imagenes.url_miniatura(c) if c.imagen else None,
+            # contadores desnormalizados (ver contadores.py): sin agregar sobre Producto
+            "productos": c.productos_disponibles, "precio_min": c.precio_min, "precio_max": c.precio_max,
+        }
+        for c in Categoria.objects.order_by("nombre")
+    ]
+    return _con_validadores(JsonResponse({"resultados": datos}), etag)
@@ -0,0 +1,133 @@
+"""
+Utilidades comunes para los comandos de benchmark (bench_*).
+
+Los benchmarks corren sobre una base temporal (la misma que usan los tests)
+para no ensuciar la base real con datos sintéticos.
+"""
+import logging
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from . import busqueda
+from .models import Categoria, Producto
+
+
+@contextmanager
+def base_temporal(verbosity=0):
+    """
+    Crea (y al final borra) la base de pruebas. En SQLite se usa un archivo
+    en WAL con espera por bloqueo en vez de la base en memoria de los tests:
+    esta última rechaza al instante a los escritores concurrentes y no se
+    parece a una base real.
+    """
+    settings_dict = connection.settings_dict
+    respaldo = {"TEST": dict(settings_dict.get("TEST", {})), "OPTIONS": dict(settings_dict.get("OPTIONS", {}))}
+    directorio = None
+    if connection.vendor == "sqlite":
+        directorio = tempfile.mkdtemp(prefix="bench-tienda-")
+        settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(directorio, "bench.sqlite3")
+        settings_dict.setdefault("OPTIONS", {}).update({
+            "timeout": 30,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+        })
+
+    setup_test_environment()
+    nombre_original = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    # los 500 de las requests fallidas se cuentan como errores; no hace falta el traceback
+    logger_requests = logging.getLogger("django.request")
+    nivel_original = logger_requests.level
+    logger_requests.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logger_requests.setLevel(nivel_original)
+        connection.creation.destroy_test_db(nombre_original, verbosity=verbosity)
+        teardown_test_environment()
+        settings_dict["TEST"], settings_dict["OPTIONS"] = respaldo["TEST"], respaldo["OPTIONS"]
+        if directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+PALABRAS = [
+    "cuaderno", "lápiz", "agenda", "álbum", "carpeta", "tijeras", "pegamento",
+    "regla", "destacador", "goma", "block", "sobre", "etiqueta", "cartulina",
+    "plumón", "corrector", "archivador", "libreta", "tarjeta", "recuerdo",
+]
+
+
+def sembrar_catalogo(n_productos, n_categorias=8, semilla=1):
+    """Crea categorías y productos sintéticos en bloque; devuelve la lista de productos."""
+    rnd = random.Random(semilla)
+    categorias = Categoria.objects.bulk_create(
+        [Categoria(nombre=f"Categoría {i}", slug=f"categoria-{i}") for i in range(n_categorias)]
+    )
+    productos = []
+    for i in range(n_productos):
+        palabras = rnd.sample(PALABRAS, 3)
+        stock = rnd.choice([0, 5, 20, 100, 1000])
+        productos.append(Producto(
+            nombre=f"{palabras[0].capitalize()} {palabras[1]} #{i}",
+            descripcion=" ".join(rnd.choices(PALABRAS, k=20)),
+            resumen=" ".join(palabras),
+            precio=Decimal(rnd.randrange(300, 30000, 10)),
+            stock=stock,
+            disponible=stock > 0,
+            categoria=rnd.choice(categorias),
+        ))
+    productos = Producto.objects.bulk_create(productos, batch_size=1000)
+    busqueda.reindexar()  # bulk_create no dispara las señales que llenan el FTS
+    return productos
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    k = (len(orden) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(orden) - 1)
+    return orden[i] + (orden[j] - orden[i]) * (k - i)
+
+
+def resumen_latencias(segundos):
+    """p50/p95/p99/media en milisegundos."""
+    ms = [s * 1000 for s in segundos]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentil(ms, 50), 3),
+        "p95_ms": round(percentil(ms, 95), 3),
+        "p99_ms": round(percentil(ms, 99), 3),
+        "media_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+    }
+
+
+def urlconf_asgi():
+    """
+    URLconf con las vistas de views_async en lugar de las sync, igual que con
+    settings.TIENDA_ASGI (que se lee al importar tienda.urls). Sirve para
+    override_settings(ROOT_URLCONF=...) en benchmarks y tests.
+    """
+    from django.urls import include, path
+
+    from . import views_async
+    from .urls import app_name, urlpatterns
+
+    reemplazos = {n: getattr(views_async, n) for n in ("inicio", "producto_detalle", "carrito_ver")}
+    patrones = [
+        path(str(p.pattern), reemplazos[p.name], name=p.name) if p.name in reemplazos else p
+        for p in urlpatterns
+    ]
+
+    class Urls:
+        urlpatterns = [path("", include((patrones, app_name)))]
+    return Urls
@@ -0,0 +1,149 @@
+"""
+Búsqueda de texto completo del catálogo.
+
+- PostgreSQL: columna tsvector `tienda_producto.busqueda` mantenida por un
+  trigger y con índice GIN (ver migración 0010). Usa la configuración
+  `es_unaccent` = diccionario spanish + unaccent ("álbum" == "album",
+  "cuadernos" == "cuaderno").
+- SQLite: tabla virtual FTS5 `tienda_producto_fts` que se mantiene al día
+  con las señales de Producto (ver signals.py). El tokenizer quita tildes y
+  cada palabra se busca en singular y como prefijo (`cuaderno*`).
+- Otros motores: se cae al `icontains` de siempre.
+
+Todas las variantes anotan `relevancia` (mayor = mejor) para poder ordenar.
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+CONFIG_PG = "es_unaccent"
+TABLA_FTS = "tienda_producto_fts"
+
+# pesos por columna (nombre, resumen, descripción) para bm25 en SQLite
+_PESOS_FTS = (10.0, 4.0, 1.0)
+
+# el plural en -es solo va tras consonante (color-es, papel-es, lápi-ces);
+# "clases" o "llaves" son -e + s y pierden solo la s
+_CONSONANTES_ES = "dlnrjy"
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Álbum' → 'album'."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def raiz(palabra):
+    """
+    Singular aproximado: quita solo el plural ('cuadernos' → 'cuaderno',
+    'lápices' → 'lapiz', 'colores' → 'color'). Como se busca por prefijo,
+    'cuaderno' encuentra también 'cuadernos'; cortar más (vocal final,
+    sufijos) juntaría palabras distintas, como 'paso' y 'pasta'.
+    """
+    w = palabra
+    if len(w) <= 3 or not w.endswith("s"):
+        return w
+    if w.endswith("ces"):
+        return w[:-3] + "z"
+    if w.endswith("es") and w[-3] in _CONSONANTES_ES:
+        return w[:-2]
+    return w[:-1]
+
+
+def terminos(q):
+    return [raiz(t) for t in re.findall(r"[a-z0-9]+", normalizar(q))]
+
+
+def consulta_fts(q):
+    """Expresión MATCH de FTS5: todas las raíces, cada una como prefijo."""
+    return " AND ".join(f'"{t}"*' for t in terminos(q))
+
+
+def buscar(qs, q, using=None):
+    """Filtra `qs` (de Producto) por `q` y anota `relevancia`."""
+    vendor = connections[using or qs.db].vendor
+
+    if vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        consulta = SearchQuery(q, config=CONFIG_PG, search_type="websearch")
+        vector = RawSQL('"tienda_producto"."busqueda"', [], output_field=SearchVectorField())
+        return (
+            qs.alias(_vector=vector)
+            .filter(_vector=consulta)
+            .annotate(relevancia=SearchRank(vector, consulta))
+        )
+
+    if vendor == "sqlite":
+        expr = consulta_fts(q)
+        if expr:
+            # el filtro usa el índice FTS una vez; la relevancia se lee por
+            # rowid solo para las filas que pasan, con la columna `rank` como
+            # bm25 con los pesos de _PESOS_FTS (se fijan en la misma consulta)
+            pesos = ", ".join(str(p) for p in _PESOS_FTS)
+            tabla = qs.model._meta.db_table
+            coinciden = RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [expr])
+            rango = RawSQL(
+                f"SELECT -rank FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s AND rank MATCH %s"
+                f" AND rowid = {tabla}.id",
+                [expr, f"bm25({pesos})"],
+                output_field=FloatField(),
+            )
+            return qs.filter(id__in=coinciden).annotate(relevancia=rango)
+
+    return qs.filter(
+        Q(nombre__icontains=q) | Q(descripcion__icontains=q)
+    ).annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+
+# --------- sincronización del índice (solo SQLite; en Postgres lo hace el trigger) ---------
+def _usa_fts(using):
+    return connections[using].vendor == "sqlite"
+
+
+def _escribir(filas, using):
+    with connections[using].cursor() as cur:
+        cur.executemany(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [(f[0],) for f in filas])
+        cur.executemany(
+            f"INSERT INTO {TABLA_FTS} (rowid, nombre, resumen, descripcion) VALUES (%s, %s, %s, %s)",
+            filas,
+        )
+
+
+def indexar(productos, using="default", lote=2000):
+    if not _usa_fts(using):
+        return
+    filas = []
+    for p in productos:
+        filas.append((p.id, p.nombre, p.resumen, p.descripcion))
+        if len(filas) >= lote:
+            _escribir(filas, using)
+            filas = []
+    if filas:
+        _escribir(filas, using)
+
+
+def desindexar(ids, using="default"):
+    if not _usa_fts(using) or not ids:
+        return
+    with connections[using].cursor() as cur:
+        cur.executemany(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [(i,) for i in ids])
+
+
+def reindexar(ids=None, using="default"):
+    """Reconstruye el índice FTS (todo, o solo los `ids` indicados)."""
+    from .models import Producto
+
+    if not _usa_fts(using):
+        return
+    qs = Producto.objects.using(using).only("id", "nombre", "resumen", "descripcion")
+    if ids is None:
+        with connections[using].cursor() as cur:
+            cur.execute(f"DELETE FROM {TABLA_FTS}")
+    else:
+        qs = qs.filter(id__in=ids)
+        desindexar(list(ids), using=using)
+    indexar(qs.iterator(chunk_size=2000), using=using)
@@ -0,0 +1,143 @@
+"""
+Caché de páginas completas del catálogo para visitantes anónimos.
+
+Con settings.TIENDA_CACHE_ANONIMA, las vistas decoradas con @cache_anonima
+guardan el HTML por URL (ruta + query string ordenado, así cada combinación
+de filtros es su propia entrada) y lo sirven sin ejecutar la vista. Solo
+entra en juego un GET anónimo sin mensajes pendientes y solo se guarda una
+respuesta 200 que no escribe cookies: nada de sesión ni de CSRF queda en la
+caché.
+
+Las páginas cacheables no llevan token CSRF: {% csrf_input %} deja el campo
+vacío y csrf.js lo completa con /csrf/ al enviar el formulario. Las
+respuestas salen con Cache-Control public (anónimos) o private (con sesión
+iniciada) y Vary: Cookie para los proxies.
+
+Cualquier cambio de producto o categoría sube versiones.PAGINAS; el stock
+que descuenta el checkout se ve a más tardar en TIENDA_CACHE_ANONIMA_TTL.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import versiones
+
+
+def _activa():
+    return getattr(settings, "TIENDA_CACHE_ANONIMA", False)
+
+
+def _anonimo(request):
+    # sin cookie de sesión es anónimo seguro y no hace falta leer la sesión
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def _sin_mensajes(request):
+    cookies = request.COOKIES
+    if CookieStorage.cookie_name not in cookies and settings.SESSION_COOKIE_NAME not in cookies:
+        return True
+    # len() carga los mensajes sin marcarlos como leídos
+    return not len(get_messages(request))
+
+
+def cacheable(request):
+    return (
+        _activa()
+        and request.method in ("GET", "HEAD")
+        and _anonimo(request)
+        and _sin_mensajes(request)
+    )
+
+
+async def _acacheable(request):
+    # con cookie de sesión hay que leerla (usuario y mensajes): eso es síncrono
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return await sync_to_async(cacheable)(request)
+    return cacheable(request)
+
+
+def _clave(request):
+    consulta = sorted(request.GET.lists())
+    firma = hashlib.md5(repr((request.path, consulta)).encode()).hexdigest()
+    return f"tienda:pagina:{versiones.version(versiones.PAGINAS)}:{firma}"
+
+
+def _guardable(request, respuesta):
+    return (
+        respuesta.status_code == 200
+        and not respuesta.streaming
+        and not respuesta.cookies
+        # alguien usó {% csrf_token %}: el HTML trae un token de este visitante
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def _cabeceras(respuesta, publica):
+    if publica:
+        patch_cache_control(respuesta, public=True, max_age=settings.TIENDA_CACHE_ANONIMA_TTL)
+    else:
+        patch_cache_control(respuesta, private=True)
+    patch_vary_headers(respuesta, ["Cookie"])
+    return respuesta
+
+
+def _desde_cache(guardada):
+    respuesta = HttpResponse(guardada["contenido"], content_type=guardada["tipo"])
+    respuesta["X-Cache-Pagina"] = "hit"
+    return _cabeceras(respuesta, publica=True)
+
+
+def _guardar(request, clave, respuesta):
+    if not _guardable(request, respuesta):
+        return _cabeceras(respuesta, publica=False)
+    cache.set(
+        clave, {"contenido": respuesta.content, "tipo": respuesta["Content-Type"]},
+        settings.TIENDA_CACHE_ANONIMA_TTL,
+    )
+    respuesta["X-Cache-Pagina"] = "miss"
+    return _cabeceras(respuesta, publica=True)
+
+
+def cache_anonima(vista):
+    """Sirve la vista desde la caché de páginas para visitantes anónimos (sync o async)."""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if not await _acacheable(request):
+                respuesta = await vista(request, *args, **kwargs)
+                return _cabeceras(respuesta, publica=False) if _activa() else respuesta
+
+            clave = await sync_to_async(_clave)(request)
+            guardada = await cache.aget(clave)
+            if guardada is not None:
+                return _desde_cache(guardada)
+
+            request.cache_anonima = True   # {% csrf_input %} no pone el token
+            respuesta = await vista(request, *args, **kwargs)
+            return await sync_to_async(_guardar)(request, clave, respuesta)
+        return envoltura
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not cacheable(request):
+            respuesta = vista(request, *args, **kwargs)
+            return _cabeceras(respuesta, publica=False) if _activa() else respuesta
+
+        clave = _clave(request)
+        guardada = cache.get(clave)
+        if guardada is not None:
+            return _desde_cache(guardada)
+
+        request.cache_anonima = True   # {% csrf_input %} no pone el token
+        respuesta = vista(request, *args, **kwargs)
+        return _guardar(request, clave, respuesta)
+    return envoltura
@@ -1,17 +1,115 @@
+import secrets
 from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+
 from .models import Producto
 
 CART_SESSION_KEY = 'cart'
+CART_ID_SESSION_KEY = 'cart_id'
 
-class Cart:
+
+# --------- ALMACENES ----------
+def codificar(data):
+    '''
+    Forma compacta del carrito para la sesión: {"12": 3, "7": 1} → "12:3,7:1".
+    Ocupa bastante menos que el JSON del dict y cabe holgada en una sesión
+    de cookie firmada.
+    '''
+    return ",".join(f"{pid}:{qty}" for pid, qty in data.items())
+
+
+def _entero(texto):
+    texto = str(texto)
+    return int(texto) if texto.isascii() and texto.isdigit() else None
+
+
+def decodificar(valor):
+    '''
+    Inversa de codificar(). Lo que no sea "id:cantidad" con cantidad positiva
+    se descarta (cookie vieja o adulterada), en vez de romper el carrito.
+    '''
+    if isinstance(valor, dict):  # formato anterior
+        pares = valor.items()
+    elif isinstance(valor, str):
+        pares = (par.partition(":")[::2] for par in valor.split(","))
+    else:
+        pares = ()
+    data = {}
+    for pid, qty in pares:
+        pid, qty = _entero(pid), _entero(qty)
+        if pid is not None and qty:
+            data[str(pid)] = qty
+    return data
+
+
+class SessionCartStore:
+    '''
+    El carrito vive dentro de la sesión: cada cambio reescribe la sesión.
+    '''
     def __init__(self, request):
         self.session = request.session
-        self.cart = self.session.get(CART_SESSION_KEY, {})
 
-    def save(self):
-        self.session[CART_SESSION_KEY] = self.cart
+    def load(self):
+        return decodificar(self.session.get(CART_SESSION_KEY))
+
+    def save(self, data):
+        self.session[CART_SESSION_KEY] = codificar(data)
+        self.session.modified = True
+
+    def clear(self):
+        self.session.pop(CART_SESSION_KEY, None)
         self.session.modified = True
 
+
+class CacheCartStore:
+    '''
+    El carrito vive en la caché (settings.TIENDA_CART_CACHE, p. ej. Redis).
+    La sesión solo guarda un id aleatorio, que se escribe una única vez; los
+    cambios posteriores del carrito no vuelven a tocar la sesión.
+    '''
+    def __init__(self, request):
+        self.session = request.session
+        self.cache = caches[getattr(settings, "TIENDA_CART_CACHE", "default")]
+        self.timeout = settings.SESSION_COOKIE_AGE
+
+    def _clave(self, crear=False):
+        cart_id = self.session.get(CART_ID_SESSION_KEY)
+        if not cart_id and crear:
+            cart_id = secrets.token_urlsafe(16)
+            self.session[CART_ID_SESSION_KEY] = cart_id
+        return f"tienda:cart:{cart_id}" if cart_id else None
+
+    def load(self):
+        clave = self._clave()
+        return self.cache.get(clave, {}) if clave else {}
+
+    def save(self, data):
+        self.cache.set(self._clave(crear=True), data, self.timeout)
+
+    def clear(self):
+        clave = self._clave()
+        if clave:
+            self.cache.delete(clave)
+
+
+CART_STORES = {
+    "session": SessionCartStore,
+    "cache": CacheCartStore,
+}
+
+
+class Cart:
+    def __init__(self, request):
+        self.store = CART_STORES[getattr(settings, "TIENDA_CART_STORE", "session")](request)
+        self.cart = self.store.load()
+        self._items = None
+
+    def save(self):
+        self.store.save(self.cart)
+        self._items = None
+
     def add(self, product_id, qty=1):
         pid = str(product_id)
         self.cart[pid] = self.cart.get(pid, 0) + int(qty)
@@ -32,16 +130,35 @@ class Cart:
         self.save()
 
     def clear(self):
-        self.session.pop(CART_SESSION_KEY, None)
-        self.session.modified = True
+        self.cart = {}
+        self._items = None
+        self.store.clear()
 
     # utilidades de lectura
     def items(self):
         '''
-        Genera items enriquecidos con objeto Producto y subtotales.
+        Items enriquecidos con objeto Producto y subtotales. Se consulta la
+        base una sola vez por request; total() y len() reutilizan la lista.
         '''
+        if self._items is None:
+            consulta = self._consulta()
+            self._items = list(self._armar_items(consulta.in_bulk() if consulta is not None else {}))
+        return self._items
+
+    async def aitems(self):
+        """items() con el ORM asíncrono (para las vistas de views_async)."""
+        if self._items is None:
+            consulta = self._consulta()
+            self._items = list(self._armar_items(await consulta.ain_bulk() if consulta is not None else {}))
+        return self._items
+
+    def _consulta(self):
         pids = [int(pid) for pid in self.cart.keys()]
-        productos = {p.id: p for p in Producto.objects.filter(id__in=pids, disponible=True)}
+        if not pids:
+            return None
+        return Producto.objects.filter(id__in=pids, disponible=True).select_related("categoria")
+
+    def _armar_items(self, productos):
         for pid, qty in self.cart.items():
             prod = productos.get(int(pid))
             if not prod:
@@ -56,3 +173,6 @@ class Cart:
 
     def total(self):
         return sum(item['subtotal'] for item in self.items())
+
+    def __len__(self):
+        return len(self.items())
@@ -0,0 +1,66 @@
+"""
+Contadores desnormalizados de Categoria: productos disponibles y rango de
+precios (de los disponibles). Los listados de categorías los leen tal cual,
+sin agregar sobre Producto en cada request.
+
+`recontar()` recalcula las categorías indicadas con un único UPDATE cuyas
+subconsultas agregan solo los productos de cada una; lo llaman las señales
+(save/delete de Producto, escrituras en bloque), el checkout cuando algún
+producto se agota y `manage.py recount_categorias` para reparar desvíos.
+El mínimo y el máximo no se pueden "restar", así que en vez de sumar y
+restar se recalcula la categoría entera: es barato con el índice de
+Producto.categoria y nunca acumula error.
+"""
+from django.db.models import Count, DecimalField, IntegerField, Max, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Categoria, Producto
+
+
+def _agregado(expresion, output_field):
+    return Subquery(
+        Producto.objects.filter(categoria=OuterRef("pk")).order_by().values("categoria")
+        .annotate(v=expresion).values("v"),
+        output_field=output_field,
+    )
+
+
+def recontar(categorias=None, using="default"):
+    """
+    Recalcula los contadores de `categorias` (ids, un queryset de ids o None
+    para todas). Devuelve cuántas filas de Categoria tocó.
+    """
+    qs = Categoria.objects.using(using)
+    if categorias is not None:
+        qs = qs.filter(pk__in=categorias)
+    precio = DecimalField(max_digits=10, decimal_places=2)
+    n = qs.update(
+        productos_disponibles=Coalesce(
+            _agregado(Count("id", filter=Q(disponible=True)), IntegerField()), Value(0)
+        ),
+        precio_min=_agregado(Min("precio", filter=Q(disponible=True)), precio),
+        precio_max=_agregado(Max("precio", filter=Q(disponible=True)), precio),
+        actualizado=timezone.now(),
+    )
+    # `actualizado` mueve versiones.categorias(): API y fragmentos de categorías
+    return n
+
+
+def recontar_de_productos(ids, using="default"):
+    """Recuenta las categorías de los productos `ids` (una sola consulta)."""
+    return recontar(
+        Producto.objects.using(using).filter(pk__in=ids, categoria__isnull=False).values("categoria_id"),
+        using=using,
+    )
+
+
+def recontar_agotados(ids, using="default"):
+    """
+    Tras descontar stock en el checkout: recuenta solo las categorías de los
+    productos de `ids` que quedaron sin stock (normalmente ninguna fila).
+    """
+    return recontar(
+        Producto.objects.using(using).filter(pk__in=ids, stock=0, categoria__isnull=False).values("categoria_id"),
+        using=using,
+    )
@@ -0,0 +1,199 @@
+"""
+Exportaciones del panel en CSV y XLSX, transmitidas con StreamingHttpResponse.
+
+Las filas salen de querysets recorridos con .iterator(chunk_size=...), así
+que la memoria usada no depende de cuántas filas se exporten. El XLSX se
+arma a mano (zip + XML mínimo de SpreadsheetML) escribiendo el zip sobre un
+buffer que se vacía en cada fragmento, sin archivo temporal ni dependencias.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import DetallePedido
+
+LOTE = 2000
+
+TIPOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# --------- FILAS ----------
+ENCABEZADO_PEDIDOS = [
+    "pedido_id", "numero_usuario", "fecha", "estado", "usuario", "email", "cupon", "total_pedido",
+    "producto_id", "producto", "cantidad", "precio_unitario", "subtotal",
+]
+
+ENCABEZADO_PRODUCTOS = [
+    "id", "nombre", "categoria", "precio", "stock", "disponible", "creado", "actualizado",
+]
+
+
+def filas_pedidos(qs):
+    """Una fila por línea de pedido (o una sola, sin producto, si el pedido no tiene líneas)."""
+    qs = qs.select_related("usuario", "descuento").prefetch_related(
+        Prefetch("detalles", DetallePedido.objects.select_related("producto"))
+    ).order_by("-creado", "-id")
+    for p in qs.iterator(chunk_size=LOTE):
+        cabecera = [
+            p.id, p.numero_usuario, timezone.localtime(p.creado), p.estado, p.usuario.username,
+            p.usuario.email, p.descuento.codigo if p.descuento else "", p.total,
+        ]
+        detalles = p.detalles.all()
+        if not detalles:
+            yield cabecera + ["", "", "", "", ""]
+        for d in detalles:
+            yield cabecera + [d.producto_id, d.producto.nombre, d.cantidad, d.precio_unitario, d.subtotal]
+
+
+def filas_productos(qs):
+    for p in qs.select_related("categoria").order_by("id").iterator(chunk_size=LOTE):
+        yield [
+            p.id, p.nombre, p.categoria.slug if p.categoria else "", p.precio, p.stock, p.disponible,
+            timezone.localtime(p.creado), timezone.localtime(p.actualizado),
+        ]
+
+
+# --------- CSV ----------
+class _Eco:
+    """Pseudo archivo: write() devuelve lo escrito para que csv.writer alimente el generador."""
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    if isinstance(valor, datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    if isinstance(valor, str) and valor[:1] in ("=", "+", "-", "@"):
+        return "'" + valor   # que la planilla no lo interprete como fórmula
+    return valor
+
+
+def generar_csv(encabezado, filas):
+    escritor = csv.writer(_Eco())
+    yield "\ufeff" + escritor.writerow(encabezado)   # BOM: Excel abre el UTF-8 con tildes
+    for fila in filas:
+        yield escritor.writerow([_texto(v) for v in fila])
+
+
+# --------- XLSX ----------
+class _Buffer:
+    """Destino del zip que no admite seek: zipfile escribe descriptores de datos y sigue."""
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes.clear()
+        return datos
+
+
+_XML_INVALIDO = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_ESTATICOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _libro(hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+
+
+def _celda(valor):
+    if valor is None or valor == "":
+        return "<c/>"
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f"<c><v>{valor}</v></c>"
+    if isinstance(valor, datetime):
+        valor = valor.strftime("%Y-%m-%d %H:%M:%S")
+    elif isinstance(valor, date):
+        valor = valor.isoformat()
+    texto = escape(_XML_INVALIDO.sub("", str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila(valores):
+    return ("<row>" + "".join(_celda(v) for v in valores) + "</row>").encode()
+
+
+def generar_xlsx(encabezado, filas, hoja="Datos", lote=500):
+    buf = _Buffer()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in _ESTATICOS.items():
+            zf.writestr(nombre, contenido)
+        zf.writestr("xl/workbook.xml", _libro(hoja))
+        yield buf.vaciar()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as hoja_xml:
+            hoja_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja_xml.write(_fila(encabezado))
+            for i, fila in enumerate(filas, 1):
+                hoja_xml.write(_fila(fila))
+                if i % lote == 0:
+                    yield buf.vaciar()
+            hoja_xml.write(b"</sheetData></worksheet>")
+    yield buf.vaciar()
+
+
+# --------- RESPUESTA ----------
+GENERADORES = {"csv": generar_csv, "xlsx": generar_xlsx}
+
+
+def respuesta(nombre, formato, encabezado, filas):
+    """StreamingHttpResponse con el archivo `nombre`-AAAAMMDD.<formato>."""
+    contenido = GENERADORES[formato](encabezado, filas)
+    r = StreamingHttpResponse(contenido, content_type=TIPOS[formato])
+    r["Content-Disposition"] = f'attachment; filename="{nombre}-{timezone.localdate():%Y%m%d}.{formato}"'
+    return r
@@ -0,0 +1,144 @@
+"""
+Conteos de la barra de filtros del catálogo (facetas).
+
+Una sola consulta agrupada por categoría sobre los productos que cumplen la
+búsqueda; cada columna es un COUNT(...) FILTER con los demás filtros, así
+que de la misma fila salen los tres números que muestra la barra:
+
+  - productos por categoría (con precio y "solo disponibles" aplicados),
+  - cuántos están disponibles (con categoría y precio aplicados),
+  - cuántos caen en cada tramo de precio (con categoría y disponibles).
+
+Cada faceta ignora su propio filtro, para que cambiarlo muestre a cuántos
+productos se llega. El resultado se guarda en la caché por búsqueda y
+filtros (no por categoría: una misma entrada sirve para todas las pills).
+"""
+import hashlib
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import versiones
+
+FACETAS_TTL = 120   # segundos; el checkout descuenta stock sin invalidar, así que el desfase máximo es este
+
+# (desde, hasta) en pesos; el extremo superior es exclusivo
+TRAMOS = [(None, 1000), (1000, 3000), (3000, 5000), (5000, 10000), (10000, None)]
+CENTAVO = Decimal("0.01")   # Producto.precio tiene dos decimales
+
+
+def _pesos(n):
+    return "$ " + f"{n:,}".replace(",", ".")
+
+
+def _etiqueta(desde, hasta):
+    if desde is None:
+        return f"Hasta {_pesos(hasta)}"
+    if hasta is None:
+        return f"{_pesos(desde)} o más"
+    return f"{_pesos(desde)} – {_pesos(hasta)}"
+
+
+def _tope(hasta):
+    """
+    Precio más alto dentro del tramo. El pmax del filtro es inclusivo, así
+    que el conteo y el enlace del tramo usan este mismo límite (999.99 y no
+    999: un producto de $ 999,50 cuenta y aparece al hacer clic).
+    """
+    return None if hasta is None else Decimal(hasta) - CENTAVO
+
+
+def _en_tramo(desde, hasta):
+    q = Q()
+    if desde is not None:
+        q &= Q(precio__gte=desde)
+    if hasta is not None:
+        q &= Q(precio__lte=_tope(hasta))
+    return q
+
+
+def _contar(*condiciones):
+    q = Q()
+    for c in condiciones:
+        q &= c
+    return Count("id", filter=q) if q else Count("id")
+
+
+def _por_categoria(qs, solo_ok, dmin, dmax):
+    """Consulta agrupada: una fila por categoría con todas las columnas."""
+    en_precio = Q()
+    if dmin is not None:
+        en_precio &= Q(precio__gte=dmin)
+    if dmax is not None:
+        en_precio &= Q(precio__lte=dmax)
+    en_ok = Q(disponible=True) if solo_ok else Q()
+
+    columnas = {
+        "n": _contar(en_precio, en_ok),
+        "disp": _contar(en_precio, Q(disponible=True)),
+        **{f"t{i}": _contar(en_ok, _en_tramo(*t)) for i, t in enumerate(TRAMOS)},
+    }
+    return qs.order_by().values("categoria__slug").annotate(**columnas)
+
+
+def _agrupar(filas):
+    """{slug (o "" sin categoría): {"n", "disp", "tramos"}}."""
+    return {
+        f["categoria__slug"] or "": {
+            "n": f["n"], "disp": f["disp"], "tramos": [f[f"t{i}"] for i in range(len(TRAMOS))],
+        }
+        for f in filas
+    }
+
+
+def _clave(q, solo_ok, dmin, dmax, version):
+    firma = hashlib.md5(repr((q.lower(), solo_ok, str(dmin), str(dmax))).encode()).hexdigest()
+    return f"{version}:{firma}"
+
+
+def calcular(qs, cat_slug="", solo_ok=False, dmin=None, dmax=None, q="", version=None):
+    """
+    Facetas para la barra de filtros. `qs` son los productos que cumplen la
+    búsqueda `q` (sin los otros filtros); `q` solo se usa en la clave de caché.
+    `version` es la de versiones.FACETAS si ya se leyó junto con las demás.
+    """
+    clave = _clave(q, solo_ok, dmin, dmax, version or versiones.version(versiones.FACETAS))
+    datos = cache.get(f"tienda:facetas:{clave}")
+    if datos is None:
+        datos = _agrupar(_por_categoria(qs, solo_ok, dmin, dmax))
+        cache.set(f"tienda:facetas:{clave}", datos, FACETAS_TTL)
+    return _resumir(datos, clave, cat_slug, dmin, dmax)
+
+
+async def acalcular(qs, cat_slug="", solo_ok=False, dmin=None, dmax=None, q="", version=None):
+    """Igual que calcular(), con el ORM y la caché asíncronos (vistas ASGI)."""
+    clave = _clave(q, solo_ok, dmin, dmax, version or await versiones.aversion(versiones.FACETAS))
+    datos = await cache.aget(f"tienda:facetas:{clave}")
+    if datos is None:
+        datos = _agrupar([f async for f in _por_categoria(qs, solo_ok, dmin, dmax)])
+        await cache.aset(f"tienda:facetas:{clave}", datos, FACETAS_TTL)
+    return _resumir(datos, clave, cat_slug, dmin, dmax)
+
+
+def _resumir(datos, clave, cat_slug, dmin, dmax):
+    if cat_slug:
+        sel = [datos[cat_slug]] if cat_slug in datos else []
+    else:
+        sel = list(datos.values())
+
+    return {
+        "clave": clave,
+        "por_categoria": {slug: d["n"] for slug, d in datos.items()},
+        "total": sum(d["n"] for d in datos.values()),
+        "disponibles": sum(d["disp"] for d in sel),
+        "tramos": [
+            {
+                "etiqueta": _etiqueta(desde, hasta),
+                "pmin": desde, "pmax": _tope(hasta),
+                "n": sum(d["tramos"][i] for d in sel),
+                "activo": (dmin, dmax) == (desde, _tope(hasta)),
+            }
+            for i, (desde, hasta) in enumerate(TRAMOS)
+        ],
+    }
@@ -0,0 +1,122 @@
+"""
+Filtros de los listados (catálogo y panel), leídos desde request.GET.
+
+Cada función devuelve el queryset filtrado y un dict `f` con los valores ya
+limpios (para repintar el formulario y armar los enlaces de paginación).
+Los valores inválidos se ignoran en vez de dar error.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from . import busqueda
+from .models import Pedido, Producto
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _decimal(valor):
+    try:
+        return Decimal(valor.replace(",", ".")) if valor else None
+    except (InvalidOperation, AttributeError):
+        return None
+
+
+# --------- CATÁLOGO ----------
+# valor de ?ord= → campo de paginar_keyset ("relevancia" solo existe con búsqueda)
+ORDENES_CATALOGO = {
+    "relevancia": "-relevancia",
+    "recientes": "-creado",
+    "precio_asc": "precio",
+    "precio_desc": "-precio",
+    "nombre_asc": "nombre",
+    "nombre_desc": "-nombre",
+}
+
+
+def buscar_catalogo(q, qs=None):
+    """Productos que cumplen la búsqueda `q` (anota `relevancia`), sin los demás filtros."""
+    qs = Producto.objects.all() if qs is None else qs
+    return busqueda.buscar(qs, q) if q else qs
+
+
+def filtrar_catalogo(params, qs=None):
+    """
+    Filtros del catálogo (inicio y la API): búsqueda, categoría (slug), solo
+    disponibles y rango de precio (inclusive). `f["orden"]` es el campo para
+    paginar_keyset según ?ord= (por defecto relevancia si hay búsqueda).
+    """
+    q        = params.get("q", "").strip()
+    cat_slug = params.get("cat", "").strip()
+    solo_ok  = params.get("ok") == "1"
+    pmin     = params.get("pmin", "").strip()
+    pmax     = params.get("pmax", "").strip()
+    ordenar  = params.get("ord") or ("relevancia" if q else "recientes")
+
+    qs = buscar_catalogo(q, qs)
+    if cat_slug:
+        qs = qs.filter(categoria__slug=cat_slug)
+    if solo_ok:
+        qs = qs.filter(disponible=True)
+
+    dmin, dmax = _decimal(pmin), _decimal(pmax)
+    if dmin is not None:
+        qs = qs.filter(precio__gte=dmin)
+    if dmax is not None:
+        qs = qs.filter(precio__lte=dmax)
+
+    if ordenar == "relevancia" and not q:
+        orden = "-creado"
+    else:
+        orden = ORDENES_CATALOGO.get(ordenar, "-creado")
+
+    f = {
+        "q": q, "cat": cat_slug, "ok": solo_ok, "pmin": pmin, "pmax": pmax, "ord": ordenar,
+        "dmin": dmin, "dmax": dmax, "orden": orden,
+    }
+    return qs, f
+
+
+def filtrar_pedidos(params, qs=None):
+    """
+    Filtros del listado de pedidos: estado, rango de fechas (inclusive),
+    cliente (username exacto) y cupón (código exacto). Cada combinación cae
+    en un índice (estado|usuario|descuento, creado) de Pedido.
+    """
+    qs = Pedido.objects.all() if qs is None else qs
+
+    estado  = params.get("estado", "").strip()
+    desde   = _fecha(params.get("desde", "").strip())
+    hasta   = _fecha(params.get("hasta", "").strip())
+    cliente = params.get("cliente", "").strip()
+    cupon   = params.get("cupon", "").strip()
+
+    if estado in dict(Pedido.ESTADOS):
+        qs = qs.filter(estado=estado)
+    else:
+        estado = ""
+    if desde:
+        qs = qs.filter(creado__gte=_inicio_del_dia(desde))
+    if hasta:
+        qs = qs.filter(creado__lt=_inicio_del_dia(hasta + timedelta(days=1)))
+    if cliente:
+        qs = qs.filter(usuario__username=cliente)
+    if cupon:
+        qs = qs.filter(descuento__codigo=cupon)
+
+    f = {
+        "estado": estado, "cliente": cliente, "cupon": cupon,
+        "desde": desde.isoformat() if desde else "",
+        "hasta": hasta.isoformat() if hasta else "",
+    }
+    return qs, f
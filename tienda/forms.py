@@ -46,3 +46,58 @@ class DescuentoForm(forms.ModelForm):
             "codigo": forms.TextInput(attrs={"class": "form-control"}),
             "porcentaje": forms.NumberInput(attrs={"class": "form-control", "min": 1, "max": 90}),
         }
+
+
+class ImportarProductosForm(forms.Form):
+    archivo = forms.FileField(label="Archivo CSV o JSON")
+    simular = forms.BooleanField(label="Solo simular (no guarda nada)", required=False, initial=True)
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        formato = archivo.name.rsplit(".", 1)[-1].lower()
+        if formato not in ("csv", "json"):
+            raise forms.ValidationError("El archivo debe ser .csv o .json.")
+        archivo.formato = formato
+        return archivo
+
+
+class AjustePreciosForm(forms.Form):
+    categoria = forms.ModelChoiceField(
+        Categoria.objects.all(), required=False, empty_label="Todas las categorías", to_field_name="slug"
+    )
+    porcentaje = forms.DecimalField(
+        label="Variación (%)", max_digits=5, decimal_places=2, min_value=-90, max_value=500,
+        help_text="Positivo sube, negativo baja. El resultado se redondea al peso.",
+    )
+
+
+class AjusteStockForm(forms.Form):
+    MODOS = [("fijar", "Fijar stock"), ("sumar", "Sumar al stock (acepta negativos)")]
+    lineas = forms.CharField(
+        label="Productos", widget=forms.Textarea(attrs={"rows": 8, "placeholder": "id o nombre, cantidad"}),
+        help_text="Una línea por producto: id o nombre exacto, coma y cantidad.",
+    )
+    modo = forms.ChoiceField(choices=MODOS, initial="fijar")
+
+    def clean_lineas(self):
+        cantidades, errores = {}, []
+        for n, linea in enumerate(self.cleaned_data["lineas"].splitlines(), start=1):
+            if not linea.strip():
+                continue
+            ref, _, cantidad = linea.rpartition(",")
+            ref, cantidad = ref.strip(), cantidad.strip()
+            if not ref or not cantidad.lstrip("-").isdigit():
+                errores.append(f"Línea {n}: se esperaba «id o nombre, cantidad».")
+                continue
+            cantidades[ref] = int(cantidad)
+        if errores:
+            raise forms.ValidationError(errores)
+        if not cantidades:
+            raise forms.ValidationError("No hay productos para ajustar.")
+        return cantidades
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get("modo") == "fijar" and any(n < 0 for n in (datos.get("lineas") or {}).values()):
+            self.add_error("lineas", "Para fijar el stock las cantidades no pueden ser negativas.")
+        return datos
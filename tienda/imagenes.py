@@ -0,0 +1,141 @@
+"""
+Derivados responsivos de las imágenes de Producto y Categoria.
+
+Al subir una imagen se generan copias más livianas en varios anchos y en
+WebP (y AVIF si Pillow lo soporta), guardadas junto al original en el mismo
+storage (disco local o MediaCloudinaryStorage). Las rutas quedan en el
+campo JSON `imagen_derivados`, así las plantillas arman el `srcset` sin
+consultar el storage:
+
+    {"origen": "productos/foto.jpg",
+     "webp": {"160": "productos/derivados/foto_160.webp", ...},
+     "avif": {...}}
+"""
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+ANCHOS = (160, 320, 640, 960)
+CALIDAD = {"webp": 80, "avif": 60}
+
+
+def formatos_disponibles():
+    return [f for f in ("avif", "webp") if features.check(f)]
+
+
+def _abrir(archivo):
+    with archivo.open("rb") as f:
+        img = Image.open(f)
+        img.load()
+    img = ImageOps.exif_transpose(img)
+    return img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+
+
+def generar_derivados(archivo):
+    """Crea los derivados de `archivo` (un FieldFile) y devuelve el dict con sus rutas."""
+    img = _abrir(archivo)
+    storage = archivo.storage
+    carpeta = posixpath.join(posixpath.dirname(archivo.name), "derivados")
+    base = posixpath.splitext(posixpath.basename(archivo.name))[0]
+
+    # nunca se agranda: anchos mayores al original se omiten (salvo el más chico)
+    anchos = [a for a in ANCHOS if a <= img.width] or [ANCHOS[0]]
+
+    # el alto también está acotado, así que una imagen muy alta (o una más
+    # angosta que ANCHOS[0]) sale más angosta que el ancho pedido: el srcset
+    # usa el ancho real de cada copia y las que coinciden se generan una vez
+    copias = {}
+    for ancho in anchos:
+        copia = img.copy()
+        copia.thumbnail((ancho, ancho * 4), Image.Resampling.LANCZOS)
+        copias.setdefault(copia.width, copia)
+
+    derivados = {"origen": archivo.name}
+    for fmt in formatos_disponibles():
+        derivados[fmt] = {}
+        for ancho, copia in copias.items():
+            buf = BytesIO()
+            copia.save(buf, format=fmt.upper(), quality=CALIDAD[fmt])
+            nombre = storage.save(f"{carpeta}/{base}_{ancho}.{fmt}", ContentFile(buf.getvalue()))
+            derivados[fmt][str(ancho)] = nombre
+    return derivados
+
+
+def borrar_derivados(derivados, storage):
+    for fmt, rutas in derivados.items():
+        if fmt == "origen":
+            continue
+        for ruta in rutas.values():
+            try:
+                storage.delete(ruta)
+            except Exception:
+                pass
+
+
+def desactualizados(instancia):
+    """True si los derivados guardados no corresponden a la imagen actual."""
+    derivados = instancia.imagen_derivados or {}
+    if not instancia.imagen:
+        return bool(derivados)
+    return derivados.get("origen") != instancia.imagen.name
+
+
+def actualizar_derivados(instancia, forzar=False):
+    """
+    Deja `imagen_derivados` al día con la imagen actual de `instancia`.
+    No hace nada si ya corresponden (salvo `forzar`). Se guarda con un
+    update() para no volver a disparar las señales de post_save.
+    """
+    archivo = instancia.imagen
+    anteriores = instancia.imagen_derivados or {}
+
+    if not (desactualizados(instancia) or (forzar and archivo)):
+        return False
+
+    nuevos = generar_derivados(archivo) if archivo else {}
+    if anteriores:
+        borrar_derivados(anteriores, instancia._meta.get_field("imagen").storage)
+
+    campos = {"imagen_derivados": nuevos}
+    if hasattr(instancia, "actualizado"):
+        # cambia la clave del fragmento cacheado de la tarjeta
+        campos["actualizado"] = timezone.now()
+    type(instancia).objects.filter(pk=instancia.pk).update(**campos)
+    for k, v in campos.items():
+        setattr(instancia, k, v)
+    return True
+
+
+# --------- lectura (plantillas / admin) ----------
+def _vigentes(instancia):
+    """Derivados de la imagen actual (vacío si todavía no se generaron para ella)."""
+    derivados = instancia.imagen_derivados or {}
+    if not instancia.imagen or derivados.get("origen") != instancia.imagen.name:
+        return {}
+    return derivados
+
+
+def srcset(instancia, fmt):
+    rutas = _vigentes(instancia).get(fmt) or {}
+    storage = instancia.imagen.storage
+    return ", ".join(
+        f"{storage.url(ruta)} {ancho}w"
+        for ancho, ruta in sorted(rutas.items(), key=lambda par: int(par[0]))
+    )
+
+
+def url_miniatura(instancia, ancho=160):
+    """URL del derivado más chico que cubra `ancho` (o del original si no hay derivados)."""
+    if not instancia.imagen:
+        return ""
+    derivados = _vigentes(instancia)
+    for fmt in ("webp", "avif"):
+        rutas = derivados.get(fmt)
+        if rutas:
+            candidatos = sorted(int(a) for a in rutas)
+            elegido = next((a for a in candidatos if a >= ancho), candidatos[-1])
+            return instancia.imagen.storage.url(rutas[str(elegido)])
+    return instancia.imagen.url
@@ -0,0 +1,194 @@
+"""
+Importación masiva del catálogo desde CSV o JSON.
+
+Cada fila se valida con las reglas de ProductoForm y Producto.clean() (sin
+stock → no disponible). Las categorías se resuelven por slug con una sola
+consulta y las filas válidas se escriben con bulk_create(update_conflicts=True)
+sobre `nombre`, por lotes: un producto existente se actualiza, uno nuevo se
+crea. Las filas con errores se informan y no se escriben.
+
+Columnas: nombre, precio, stock, descripcion, resumen, disponible, categoria (slug).
+Un archivo puede traer solo algunas: a los productos existentes se les
+actualizan únicamente las columnas presentes y las demás conservan su valor;
+los valores por defecto (vacío, disponible) se aplican solo al crear.
+"""
+import csv
+import io
+import json
+
+from django import forms
+from django.db import transaction
+
+from .forms import ProductoForm
+from .models import Categoria, Producto
+from .signals import productos_actualizados_en_bloque
+
+COLUMNAS = ["nombre", "descripcion", "resumen", "precio", "stock", "disponible", "categoria"]
+CAMPOS_ACTUALIZABLES = ["descripcion", "resumen", "precio", "stock", "disponible", "categoria", "actualizado"]
+VERDADEROS = {"1", "true", "si", "sí", "s", "yes", "y", "x"}
+
+
+class ErrorDeArchivo(Exception):
+    pass
+
+
+class FilaProductoForm(ProductoForm):
+    """ProductoForm con la categoría por slug y sin validar unicidad (el nombre repetido actualiza)."""
+    categoria = forms.CharField(required=False)
+
+    def __init__(self, *args, categorias, **kwargs):
+        self.categorias = categorias
+        super().__init__(*args, **kwargs)
+
+    def clean_precio(self):
+        precio = self.cleaned_data["precio"]
+        if precio is not None and precio < 0:
+            raise forms.ValidationError("El precio no puede ser negativo.")
+        return precio
+
+    def clean_categoria(self):
+        slug = self.cleaned_data["categoria"].strip()
+        if not slug:
+            return None
+        if slug not in self.categorias:
+            raise forms.ValidationError(f"No existe la categoría «{slug}».")
+        return self.categorias[slug]
+
+    def validate_unique(self):
+        pass
+
+    def _get_validation_exclusions(self):
+        # Validar la FK y los CheckConstraint del modelo cuesta una consulta por
+        # fila; la categoría ya viene del dict y precio/stock los valida el form.
+        return super()._get_validation_exclusions() | {"categoria", "precio", "stock"}
+
+
+class ResultadoImportacion:
+    def __init__(self, simulacion):
+        self.simulacion = simulacion
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []   # (número de fila, ["campo: mensaje", ...])
+
+    @property
+    def validos(self):
+        return self.creados + self.actualizados
+
+
+# --------- LECTURA ----------
+def leer_filas(archivo, formato):
+    """Lista de dicts desde un archivo CSV (con encabezado) o JSON (lista de objetos)."""
+    datos = archivo.read()
+    if isinstance(datos, bytes):
+        try:
+            datos = datos.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ErrorDeArchivo("El archivo debe estar en UTF-8.")
+    if formato == "json":
+        try:
+            filas = json.loads(datos)
+        except ValueError as e:
+            raise ErrorDeArchivo(f"JSON inválido: {e}")
+        if not isinstance(filas, list) or not all(isinstance(f, dict) for f in filas):
+            raise ErrorDeArchivo("El JSON debe ser una lista de objetos.")
+        return filas
+    if formato == "csv":
+        lector = csv.DictReader(io.StringIO(datos))
+        if not lector.fieldnames or "nombre" not in lector.fieldnames:
+            raise ErrorDeArchivo("El CSV necesita una fila de encabezado con al menos «nombre».")
+        return list(lector)
+    raise ErrorDeArchivo(f"Formato no soportado: {formato}")
+
+
+def _datos_del_form(fila, actual=None, slugs=None):
+    """
+    Datos para FilaProductoForm. Las columnas que la fila no trae se toman
+    del producto `actual` (si ya existe) o quedan vacías (si es nuevo).
+    """
+    datos = {}
+    for c in COLUMNAS:
+        if c == "disponible":
+            continue
+        if c in fila:
+            datos[c] = "" if fila[c] is None else str(fila[c]).strip()
+        elif actual is not None:
+            datos[c] = slugs.get(actual.categoria_id, "") if c == "categoria" else str(getattr(actual, c))
+        else:
+            datos[c] = ""
+    disponible = "" if fila.get("disponible") is None else str(fila["disponible"]).strip()
+    if disponible:
+        marcado = disponible.lower() in VERDADEROS
+    else:
+        # sin valor: un producto existente conserva el suyo; uno nuevo se asume
+        # disponible (clean() lo apaga si no hay stock)
+        marcado = actual.disponible if actual is not None else True
+    if marcado:
+        datos["disponible"] = "on"
+    return datos
+
+
+def _columnas_presentes(fila):
+    """
+    update_fields para un producto existente: las columnas que trae la fila y
+    `actualizado`. Con `stock` va también `disponible`, que clean() apaga sin stock.
+    """
+    presentes = set(fila) | {"actualizado"}
+    if "stock" in presentes:
+        presentes.add("disponible")
+    return tuple(c for c in CAMPOS_ACTUALIZABLES if c in presentes)
+
+
+# --------- IMPORTACIÓN ----------
+def importar_productos(filas, simular=False, lote=500):
+    resultado = ResultadoImportacion(simular)
+    categorias = {c.slug: c for c in Categoria.objects.all()}
+    slugs = {c.id: slug for slug, c in categorias.items()}
+
+    nombres = list({str(f.get("nombre") or "").strip() for f in filas} - {""})
+    existentes = {}
+    for i in range(0, len(nombres), lote):
+        existentes.update(
+            (p.nombre, p) for p in Producto.objects.filter(nombre__in=nombres[i:i + lote]).only(*COLUMNAS)
+        )
+
+    # update_fields → productos (los nuevos van con todas las columnas)
+    por_campos, vistos = {}, {}
+    for n, fila in enumerate(filas, start=1):
+        actual = existentes.get(str(fila.get("nombre") or "").strip())
+        form = FilaProductoForm(_datos_del_form(fila, actual, slugs), instance=Producto(), categorias=categorias)
+        if not form.is_valid():
+            resultado.errores.append((n, [
+                f"{campo}: {m}" if campo != "__all__" else m
+                for campo, mensajes in form.errors.items() for m in mensajes
+            ]))
+            continue
+        producto = form.instance
+        if producto.nombre in vistos:
+            resultado.errores.append((n, [f"nombre: repetido (ya viene en la fila {vistos[producto.nombre]})"]))
+            continue
+        vistos[producto.nombre] = n
+        if producto.nombre in existentes:
+            resultado.actualizados += 1
+            campos = _columnas_presentes(fila)
+        else:
+            resultado.creados += 1
+            campos = tuple(CAMPOS_ACTUALIZABLES)
+        por_campos.setdefault(campos, []).append(producto)
+
+    if simular or not vistos:
+        return resultado
+
+    with transaction.atomic():
+        ids = []
+        for campos, productos in por_campos.items():
+            for i in range(0, len(productos), lote):
+                parte = productos[i:i + lote]
+                Producto.objects.bulk_create(
+                    parte, update_conflicts=True, unique_fields=["nombre"], update_fields=list(campos),
+                )
+                ids += Producto.objects.filter(nombre__in=[p.nombre for p in parte]).values_list("id", flat=True)
+        # sin productos nuevos se sabe qué columnas cambiaron (p. ej. solo stock: no hay que reindexar)
+        escritos = None if resultado.creados else sorted({c for campos in por_campos for c in campos})
+        productos_actualizados_en_bloque.send(sender=Producto, ids=ids, using="default", campos=escritos)
+
+    return resultado
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+from tienda.bench import PALABRAS, base_temporal, resumen_latencias, sembrar_catalogo, urlconf_asgi
+
+# peso de cada flujo de lectura en la mezcla
+FLUJOS = {"inicio": 50, "producto_detalle": 30, "carrito_ver": 20}
+
+
+class ClienteAsgi:
+    """
+    Cliente mínimo que habla ASGI directo con ASGIHandler, como lo haría
+    uvicorn. (AsyncClient de los tests no abre un ThreadSensitiveContext por
+    request y serializa todo el código sync en un solo hilo: no sirve para
+    medir concurrencia.)
+    """
+    def __init__(self, app):
+        self.app = app
+        self.cookies = SimpleCookie()
+
+    async def pedir(self, metodo, ruta, params=None, cuerpo=b"", cabeceras=()):
+        galletas = "; ".join(f"{k}={m.value}" for k, m in self.cookies.items())
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": metodo, "scheme": "http", "path": ruta, "raw_path": ruta.encode(),
+            "query_string": urlencode(params or {}).encode(), "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"cookie", galletas.encode()), *cabeceras],
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        }
+        pendiente = [{"type": "http.request", "body": cuerpo, "more_body": False}]
+        respuesta = {"status": None, "cuerpo": b""}
+
+        async def receive():
+            if pendiente:
+                return pendiente.pop()
+            await asyncio.Event().wait()   # el cliente nunca se desconecta
+
+        async def send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["status"] = mensaje["status"]
+                for nombre, valor in mensaje["headers"]:
+                    if nombre.lower() == b"set-cookie":
+                        self.cookies.load(valor.decode())
+            elif mensaje["type"] == "http.response.body":
+                respuesta["cuerpo"] += mensaje.get("body", b"")
+
+        await self.app(scope, receive, send)
+        return respuesta
+
+    async def get(self, ruta, params=None):
+        return await self.pedir("GET", ruta, params)
+
+    async def post(self, ruta, datos):
+        token = json.loads((await self.get("/csrf/"))["cuerpo"])["token"]
+        return await self.pedir("POST", ruta, cuerpo=urlencode(datos).encode(), cabeceras=[
+            (b"content-type", b"application/x-www-form-urlencoded"), (b"x-csrftoken", token.encode()),
+        ])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara cuántos requests concurrentes atiende un proceso con WSGI (un hilo por "
+        "request, como gunicorn gthread; con 1 hilo es el worker sync) y con ASGI (vistas "
+        "de views_async en un event loop), sobre inicio, ficha y carrito. --espera-db "
+        "simula la latencia de red de una base remota en cada consulta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=1000)
+        parser.add_argument("--requests", type=int, default=400, help="Requests por nivel y modo")
+        parser.add_argument("--concurrencia", default="1,8,32",
+                            help="Niveles de concurrencia por proceso, separados por coma")
+        parser.add_argument("--espera-db", type=float, default=5.0, help="Milisegundos agregados a cada consulta")
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--json", dest="salida_json", help="Ruta donde guardar los resultados")
+
+    def handle(self, *args, **opts):
+        niveles = [int(n) for n in opts["concurrencia"].split(",") if n.strip()]
+        resultados = {"wsgi": {}, "asgi": {}}
+
+        with base_temporal():
+            productos = sembrar_catalogo(opts["productos"], semilla=opts["semilla"])
+            contexto = {
+                "ids": [p.id for p in productos if p.disponible],
+                "slugs": sorted({p.categoria.slug for p in productos}),
+            }
+            with self._latencia_db(opts["espera_db"] / 1000):
+                for n in niveles:
+                    resultados["wsgi"][n] = self._wsgi(n, contexto, opts)
+                    with override_settings(ROOT_URLCONF=urlconf_asgi()):
+                        resultados["asgi"][n] = asyncio.run(self._asgi(n, contexto, opts))
+
+        self._imprimir(resultados, opts)
+        if opts["salida_json"]:
+            with open(opts["salida_json"], "w", encoding="utf-8") as f:
+                json.dump({"benchmark": "asgi", "opciones": opts, "resultados": resultados}, f, indent=2, default=str)
+            self.stdout.write(f"Resultados guardados en {opts['salida_json']}")
+
+    # --------- latencia simulada ----------
+    @contextmanager
+    def _latencia_db(self, segundos):
+        """Agrega `segundos` a cada consulta, en todas las conexiones (también las de otros hilos)."""
+        def esperar(execute, sql, params, many, context):
+            time.sleep(segundos)
+            return execute(sql, params, many, context)
+
+        def al_conectar(sender, connection, **kwargs):
+            connection.execute_wrappers.append(esperar)
+
+        if segundos <= 0:
+            yield
+            return
+        connection_created.connect(al_conectar, weak=False)
+        for c in connections.all():
+            c.execute_wrappers.append(esperar)
+        try:
+            yield
+        finally:
+            connection_created.disconnect(al_conectar)
+            for c in connections.all():
+                if esperar in c.execute_wrappers:
+                    c.execute_wrappers.remove(esperar)
+
+    # --------- flujos ----------
+    def _url(self, rnd, ctx):
+        flujo = rnd.choices(list(FLUJOS), weights=FLUJOS.values())[0]
+        if flujo == "producto_detalle":
+            return flujo, f"/producto/{rnd.choice(ctx['ids'])}/", {}
+        if flujo == "carrito_ver":
+            return flujo, "/carrito/", {}
+        params = {"ord": rnd.choice(["recientes", "precio_asc", "nombre_asc"])}
+        if rnd.random() < 0.3:
+            params["q"] = rnd.choice(PALABRAS)
+        if rnd.random() < 0.4:
+            params["cat"] = rnd.choice(ctx["slugs"])
+        return flujo, "/", params
+
+    def _cuotas(self, n, total):
+        return [total // n + (1 if i < total % n else 0) for i in range(n)]
+
+    # --------- WSGI: un hilo por request en curso ----------
+    def _wsgi(self, n, ctx, opts):
+        def cliente(i, cuota):
+            rnd = random.Random(opts["semilla"] + i)
+            client = Client()
+            client.post(f"/carrito/agregar/{rnd.choice(ctx['ids'])}/", {"qty": 1})
+            muestras, errores = [], 0
+            for _ in range(cuota):
+                _, url, params = self._url(rnd, ctx)
+                t0 = time.perf_counter()
+                r = client.get(url, params)
+                muestras.append(time.perf_counter() - t0)
+                errores += r.status_code not in (200, 302)
+            connections.close_all()
+            return muestras, errores
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            partes = list(pool.map(cliente, range(n), self._cuotas(n, opts["requests"])))
+        return self._resumen(partes, time.perf_counter() - t0)
+
+    # --------- ASGI: todas las requests en el mismo event loop ----------
+    async def _asgi(self, n, ctx, opts):
+        app = ASGIHandler()
+
+        async def cliente(i, cuota):
+            rnd = random.Random(opts["semilla"] + i)
+            client = ClienteAsgi(app)
+            await client.post(f"/carrito/agregar/{rnd.choice(ctx['ids'])}/", {"qty": 1})
+            muestras, errores = [], 0
+            for _ in range(cuota):
+                _, url, params = self._url(rnd, ctx)
+                t0 = time.perf_counter()
+                r = await client.get(url, params)
+                muestras.append(time.perf_counter() - t0)
+                errores += r["status"] not in (200, 302)
+            return muestras, errores
+
+        t0 = time.perf_counter()
+        partes = await asyncio.gather(*(cliente(i, c) for i, c in enumerate(self._cuotas(n, opts["requests"]))))
+        return self._resumen(partes, time.perf_counter() - t0)
+
+    def _resumen(self, partes, duracion):
+        muestras = [s for m, _ in partes for s in m]
+        return {
+            **resumen_latencias(muestras),
+            "requests_por_segundo": round(len(muestras) / duracion, 2) if duracion else 0.0,
+            "errores": sum(e for _, e in partes),
+        }
+
+    # --------- salida ----------
+    def _imprimir(self, resultados, opts):
+        self.stdout.write(f"Latencia simulada por consulta: {opts['espera_db']} ms")
+        self.stdout.write(f"{'modo':<6}{'concurrencia':>13}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'errores':>9}")
+        for modo, por_nivel in resultados.items():
+            for n, r in por_nivel.items():
+                self.stdout.write(
+                    f"{modo:<6}{n:>13}{r['requests_por_segundo']:>10.2f}{r['p50_ms']:>9.2f}"
+                    f"{r['p95_ms']:>9.2f}{r['errores']:>9}"
+                )
+        self.stdout.write("wsgi con concurrencia 1 = worker sync de gunicorn (el Procfile por defecto).")
@@ -0,0 +1,86 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from tienda.bench import base_temporal, resumen_latencias, sembrar_catalogo
+
+class Command(BaseCommand):
+    help = (
+        "Compara el costo por request de los motores de sesión con el flujo real "
+        "carrito_agregar → carrito_ver, sobre una base temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iteraciones", type=int, default=200)
+        parser.add_argument("--productos", type=int, default=100)
+        # los mismos nombres que acepta SESSION_BACKEND (settings.SESSION_ENGINES)
+        parser.add_argument("--motores", default=",".join(settings.SESSION_ENGINES),
+                            help="Lista separada por comas: " + ", ".join(settings.SESSION_ENGINES))
+        parser.add_argument("--json", dest="salida_json", help="Ruta donde guardar los resultados")
+
+    def handle(self, *args, **opts):
+        motores = [m.strip() for m in opts["motores"].split(",") if m.strip()]
+        desconocidos = [m for m in motores if m not in settings.SESSION_ENGINES]
+        if desconocidos:
+            raise CommandError(f"Motores desconocidos: {', '.join(desconocidos)}")
+        resultados = {}
+
+        with base_temporal():
+            productos = [p for p in sembrar_catalogo(opts["productos"]) if p.disponible]
+            for motor in motores:
+                with override_settings(SESSION_ENGINE=settings.SESSION_ENGINES[motor]):
+                    resultados[motor] = self._medir(productos, opts["iteraciones"])
+
+        self._imprimir(resultados)
+        if opts["salida_json"]:
+            with open(opts["salida_json"], "w", encoding="utf-8") as f:
+                json.dump({"benchmark": "sesiones", "resultados": resultados}, f, indent=2)
+            self.stdout.write(f"Resultados guardados en {opts['salida_json']}")
+
+    def _medir(self, productos, iteraciones):
+        rnd = random.Random(7)
+        client = Client()
+        t_agregar, t_ver = [], []
+        consultas = consultas_sesion = 0
+
+        for _ in range(iteraciones):
+            p = rnd.choice(productos)
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                client.post(f"/carrito/agregar/{p.id}/", {"qty": 1})
+                t1 = time.perf_counter()
+                client.get("/carrito/")
+                t2 = time.perf_counter()
+            t_agregar.append(t1 - t0)
+            t_ver.append(t2 - t1)
+            consultas += len(ctx.captured_queries)
+            consultas_sesion += sum("django_session" in q["sql"] for q in ctx.captured_queries)
+
+        cookie = client.cookies.get(settings.SESSION_COOKIE_NAME)
+        requests = iteraciones * 2
+        return {
+            "carrito_agregar": resumen_latencias(t_agregar),
+            "carrito_ver": resumen_latencias(t_ver),
+            "consultas_por_request": round(consultas / requests, 2),
+            "consultas_sesion_por_request": round(consultas_sesion / requests, 2),
+            "bytes_cookie_sesion": len(cookie.value) if cookie else 0,
+        }
+
+    def _imprimir(self, resultados):
+        self.stdout.write(
+            f"{'motor':<16}{'agregar p50':>12}{'agregar p95':>12}{'ver p50':>10}{'ver p95':>10}"
+            f"{'SQL/req':>9}{'SQL ses/req':>12}{'cookie B':>10}"
+        )
+        for motor, r in resultados.items():
+            self.stdout.write(
+                f"{motor:<16}{r['carrito_agregar']['p50_ms']:>12.2f}{r['carrito_agregar']['p95_ms']:>12.2f}"
+                f"{r['carrito_ver']['p50_ms']:>10.2f}{r['carrito_ver']['p95_ms']:>10.2f}"
+                f"{r['consultas_por_request']:>9.2f}{r['consultas_sesion_por_request']:>12.2f}"
+                f"{r['bytes_cookie_sesion']:>10}"
+            )
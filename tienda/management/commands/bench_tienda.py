@@ -0,0 +1,199 @@
+import json
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tienda.bench import PALABRAS, base_temporal, resumen_latencias, sembrar_catalogo
+
+# r.context del cliente de pruebas no es confiable con varios hilos (las señales
+# de render se mezclan), así que cursor y token se leen del HTML
+RE_CURSOR_SIGUIENTE = re.compile(r'cursor=([\w-]+)[^"]*">Ver más')
+RE_TOKEN_CHECKOUT = re.compile(r'name="token" value="([^"]+)"')
+
+# peso de cada flujo en la mezcla de tráfico
+FLUJOS = {
+    "inicio": 50,
+    "producto_detalle": 30,
+    "carrito_agregar": 15,
+    "checkout": 5,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de la tienda: genera un catálogo y usuarios sintéticos en una base "
+        "temporal, recorre los flujos reales (catálogo con filtros, ficha, agregar al "
+        "carrito, checkout) con varios workers y reporta p50/p95/p99, requests/s y "
+        "consultas por request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=2000)
+        parser.add_argument("--usuarios", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=1000, help="Total de requests a disparar")
+        parser.add_argument("--workers", type=int, default=4, help="Hilos concurrentes")
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--json", dest="salida_json", help="Ruta donde guardar los resultados")
+
+    def handle(self, *args, **opts):
+        with base_temporal():
+            productos = sembrar_catalogo(opts["productos"], semilla=opts["semilla"])
+            usuarios = User.objects.bulk_create(
+                [User(username=f"bench{i}", password="!") for i in range(opts["usuarios"])]
+            )
+            contexto = {
+                "ids": [p.id for p in productos if p.disponible],
+                "slugs": sorted({p.categoria.slug for p in productos}),
+                "usuarios": usuarios,
+            }
+            resultado = self._correr(contexto, opts)
+
+        resultado["meta"] = self._meta(opts)
+        self._imprimir(resultado)
+        if opts["salida_json"]:
+            with open(opts["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2)
+            self.stdout.write(f"Resultados guardados en {opts['salida_json']}")
+
+    # --------- ejecución ----------
+    def _correr(self, contexto, opts):
+        n_workers = max(1, opts["workers"])
+        cuota = [opts["requests"] // n_workers + (1 if i < opts["requests"] % n_workers else 0)
+                 for i in range(n_workers)]
+        muestras = {f: [] for f in FLUJOS}   # (segundos, consultas)
+        errores = {f: 0 for f in FLUJOS}
+        candado = threading.Lock()
+        largada = threading.Barrier(n_workers + 1)
+
+        def worker(i):
+            rnd = random.Random(opts["semilla"] + i)
+            client = Client()
+            client.force_login(contexto["usuarios"][i % len(contexto["usuarios"])])
+            propias = {f: [] for f in FLUJOS}
+            fallas = {f: 0 for f in FLUJOS}
+            try:
+                largada.wait()
+                for _ in range(cuota[i]):
+                    flujo = rnd.choices(list(FLUJOS), weights=FLUJOS.values())[0]
+                    try:
+                        with CaptureQueriesContext(connection) as ctx:
+                            t0 = time.perf_counter()
+                            ok = getattr(self, f"_flujo_{flujo}")(client, rnd, contexto)
+                            dt = time.perf_counter() - t0
+                        if ok:
+                            propias[flujo].append((dt, len(ctx.captured_queries)))
+                        else:
+                            fallas[flujo] += 1
+                    except Exception:
+                        fallas[flujo] += 1
+            finally:
+                connection.close()
+                with candado:
+                    for f in FLUJOS:
+                        muestras[f].extend(propias[f])
+                        errores[f] += fallas[f]
+
+        hilos = [threading.Thread(target=worker, args=(i,)) for i in range(n_workers)]
+        for h in hilos:
+            h.start()
+        largada.wait()
+        t_inicio = time.perf_counter()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - t_inicio
+
+        total = sum(len(m) for m in muestras.values())
+        flujos = {}
+        for f, m in muestras.items():
+            flujos[f] = {
+                **resumen_latencias([s for s, _ in m]),
+                "consultas_por_request": round(sum(q for _, q in m) / len(m), 2) if m else 0.0,
+                "errores": errores[f],
+            }
+        todas = [s for m in muestras.values() for s, _ in m]
+        return {
+            "total": {
+                **resumen_latencias(todas),
+                "requests_por_segundo": round(total / duracion, 2) if duracion else 0.0,
+                "duracion_s": round(duracion, 3),
+                "errores": sum(errores.values()),
+            },
+            "flujos": flujos,
+        }
+
+    # --------- flujos (devuelven True si la respuesta fue la esperada) ----------
+    def _flujo_inicio(self, client, rnd, ctx):
+        params = {}
+        if rnd.random() < 0.3:
+            params["q"] = rnd.choice(PALABRAS)
+        if rnd.random() < 0.4:
+            params["cat"] = rnd.choice(ctx["slugs"])
+        if rnd.random() < 0.3:
+            params["ok"] = "1"
+        if rnd.random() < 0.2:
+            params["pmin"], params["pmax"] = "1000", "15000"
+        params["ord"] = rnd.choice(["recientes", "precio_asc", "precio_desc", "nombre_asc", "nombre_desc"])
+        r = client.get("/", params)
+        siguiente = RE_CURSOR_SIGUIENTE.search(r.content.decode()) if r.status_code == 200 else None
+        if siguiente and rnd.random() < 0.3:
+            r = client.get("/", {**params, "cursor": siguiente.group(1)})
+        return r.status_code == 200
+
+    def _flujo_producto_detalle(self, client, rnd, ctx):
+        r = client.get(f"/producto/{rnd.choice(ctx['ids'])}/")
+        return r.status_code in (200, 302)
+
+    def _flujo_carrito_agregar(self, client, rnd, ctx):
+        r = client.post(f"/carrito/agregar/{rnd.choice(ctx['ids'])}/", {"qty": 1, "next": "/carrito/"})
+        return r.status_code == 302
+
+    def _flujo_checkout(self, client, rnd, ctx):
+        client.post(f"/carrito/agregar/{rnd.choice(ctx['ids'])}/", {"qty": 1, "next": "/carrito/"})
+        r = client.get("/checkout/")
+        token = RE_TOKEN_CHECKOUT.search(r.content.decode()) if r.status_code == 200 else None
+        if not token:
+            return False
+        r = client.post("/checkout/", {"token": token.group(1)})
+        return r.status_code == 302
+
+    # --------- salida ----------
+    def _meta(self, opts):
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            "benchmark": "tienda",
+            "fecha": timezone.now().isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "motor_db": connection.vendor,
+            "opciones": {k: opts[k] for k in ("productos", "usuarios", "requests", "workers", "semilla")},
+        }
+
+    def _imprimir(self, r):
+        self.stdout.write(
+            f"{'flujo':<18}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL/req':>9}{'errores':>9}"
+        )
+        for f, d in r["flujos"].items():
+            self.stdout.write(
+                f"{f:<18}{d['n']:>6}{d['p50_ms']:>9.2f}{d['p95_ms']:>9.2f}{d['p99_ms']:>9.2f}"
+                f"{d['consultas_por_request']:>9.2f}{d['errores']:>9}"
+            )
+        t = r["total"]
+        self.stdout.write(
+            f"Total: {t['n']} requests en {t['duracion_s']} s → {t['requests_por_segundo']} req/s "
+            f"(p50 {t['p50_ms']} ms, p95 {t['p95_ms']} ms, p99 {t['p99_ms']} ms, errores {t['errores']})"
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from tienda.imagenes import actualizar_derivados
+from tienda.models import Categoria, Producto
+
+MODELOS = {"producto": Producto, "categoria": Categoria}
+
+
+class Command(BaseCommand):
+    help = "Genera (o regenera con --forzar) los derivados responsivos de las imágenes existentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=MODELOS, action="append",
+                            help="Limitar a producto y/o categoria (por defecto ambos)")
+        parser.add_argument("--forzar", action="store_true",
+                            help="Regenerar aunque ya existan derivados para la imagen actual")
+
+    def handle(self, *args, **opts):
+        for nombre in opts["modelo"] or list(MODELOS):
+            modelo = MODELOS[nombre]
+            generados = errores = 0
+            for obj in modelo.objects.exclude(imagen="").exclude(imagen__isnull=True).iterator(chunk_size=200):
+                try:
+                    if actualizar_derivados(obj, forzar=opts["forzar"]):
+                        generados += 1
+                except Exception as e:
+                    errores += 1
+                    self.stderr.write(f"{nombre} #{obj.pk} ({obj.imagen.name}): {e}")
+            self.stdout.write(self.style.SUCCESS(f"{nombre}: {generados} con derivados nuevos, {errores} con error"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tienda.importar import ErrorDeArchivo, importar_productos, leer_filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos desde un CSV o JSON (columnas: nombre, precio, stock, descripcion, "
+        "resumen, disponible, categoria). Los nombres existentes se actualizan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument("--formato", choices=["csv", "json"],
+                            help="Por defecto se deduce de la extensión")
+        parser.add_argument("--simular", action="store_true", help="Validar e informar sin escribir")
+        parser.add_argument("--lote", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        formato = opts["formato"] or opts["archivo"].rsplit(".", 1)[-1].lower()
+        try:
+            with open(opts["archivo"], "rb") as f:
+                filas = leer_filas(f, formato)
+        except (OSError, ErrorDeArchivo) as e:
+            raise CommandError(str(e))
+
+        r = importar_productos(filas, simular=opts["simular"], lote=opts["lote"])
+
+        for n, mensajes in r.errores:
+            self.stderr.write(f"Fila {n}: {'; '.join(mensajes)}")
+        prefijo = "[simulación] " if r.simulacion else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{r.creados} nuevos, {r.actualizados} actualizados, {len(r.errores)} con errores."
+        ))
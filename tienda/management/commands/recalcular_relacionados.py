@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tienda.relacionados import GUARDADOS, recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los productos \"comprados juntos\" a partir de los pedidos. "
+        "Pensado para correr periódicamente (cron), p. ej. cada noche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None,
+                            help="Solo pedidos de los últimos N días (por defecto, toda la historia)")
+        parser.add_argument("--top", type=int, default=GUARDADOS, help="Vecinos guardados por producto")
+        parser.add_argument("--minimo", type=int, default=1,
+                            help="Pedidos en común necesarios para relacionar dos productos")
+
+    def handle(self, *args, **opts):
+        desde = timezone.now() - timedelta(days=opts["dias"]) if opts["dias"] else None
+        n = recalcular(top=opts["top"], minimo=opts["minimo"], desde=desde)
+        self.stdout.write(self.style.SUCCESS(f"Productos relacionados recalculados: {n} pares."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tienda.resumenes import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los resúmenes de ventas (por día, por producto y por cupón)."
+
+    def handle(self, *args, **opts):
+        n = reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos: {n['dias']} días, {n['productos_dia']} filas producto/día, "
+            f"{n['cupones']} cupones."
+        ))
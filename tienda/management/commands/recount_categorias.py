@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tienda.contadores import recontar
+from tienda.models import Categoria
+
+CAMPOS = ("id", "productos_disponibles", "precio_min", "precio_max")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores de cada categoría (productos disponibles y "
+        "rango de precios) por si se desviaron de los productos."
+    )
+
+    def handle(self, *args, **opts):
+        antes = set(Categoria.objects.values_list(*CAMPOS))
+        n = recontar()
+        corregidas = len(set(Categoria.objects.values_list(*CAMPOS)) - antes)
+        self.stdout.write(self.style.SUCCESS(f"{n} categorías recontadas, {corregidas} corregidas."))
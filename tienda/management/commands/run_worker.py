@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import signal
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+logger = logging.getLogger("tienda.tareas")
+
+REVISAR_CADA = 1.0     # segundos entre revisiones de los hijos
+MAX_REINICIOS = 5      # por minuto; si mueren más seguido, reiniciar no lo arregla
+
+
+def _proceso(parar, espera):
+    # con "spawn" (Windows/macOS) el hijo arranca sin Django configurado
+    import django
+    django.setup()
+    from tienda.tareas import trabajar
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # el padre coordina el apagado
+    trabajar(parar, espera)
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de tareas (tienda.Tarea): derivados de imágenes, correos "
+        "y calentado de caché. Con --procesos N levanta N procesos en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=1)
+        parser.add_argument("--espera", type=float, default=1.0,
+                            help="Segundos entre sondeos cuando la cola está vacía")
+        parser.add_argument("--una-vez", action="store_true",
+                            help="Vaciar la cola y salir (cron, depuración)")
+
+    def handle(self, *args, **opts):
+        from tienda.tareas import procesar_pendientes, recuperar_colgadas, trabajar
+
+        if opts["una_vez"]:
+            recuperar_colgadas()
+            self.stdout.write(f"{procesar_pendientes()} tareas ejecutadas")
+            return
+
+        parar = multiprocessing.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: parar.set())
+
+        n = max(1, opts["procesos"])
+        self.stdout.write(f"Worker escuchando con {n} proceso(s). Ctrl+C para detener.")
+        if n == 1:
+            trabajar(parar, opts["espera"])
+            return
+
+        # los hijos no deben heredar las conexiones abiertas del padre
+        connections.close_all()
+        procesos = [self._lanzar(parar, opts["espera"]) for _ in range(n)]
+        reinicios = deque()
+        try:
+            # un hijo que muere (OOM, excepción) se reemplaza; si mueren en
+            # cadena se sale con error para que el gestor (Render, systemd)
+            # reinicie el worker completo
+            while not parar.wait(REVISAR_CADA):
+                for i, p in enumerate(procesos):
+                    if p.is_alive():
+                        continue
+                    ahora = time.monotonic()
+                    reinicios.append(ahora)
+                    while ahora - reinicios[0] > 60:
+                        reinicios.popleft()
+                    if len(reinicios) > MAX_REINICIOS:
+                        raise CommandError(
+                            f"Los procesos del worker murieron {len(reinicios)} veces en un minuto; se detiene."
+                        )
+                    logger.error("Proceso %s del worker murió (código %s); se reinicia", p.pid, p.exitcode)
+                    self.stderr.write(f"Proceso {p.pid} murió (código {p.exitcode}); se reinicia.")
+                    procesos[i] = self._lanzar(parar, opts["espera"])
+        finally:
+            parar.set()
+            for p in procesos:
+                p.join()
+        self.stdout.write("Worker detenido.")
+
+    def _lanzar(self, parar, espera):
+        p = multiprocessing.Process(target=_proceso, args=(parar, espera), daemon=True)
+        p.start()
+        return p
@@ -0,0 +1,198 @@
+"""
+Métricas por request: vista, tiempo total, tiempo en la base, número de
+consultas y consultas repetidas.
+
+MetricasMiddleware solo se activa con settings.TIENDA_METRICAS; si no, se
+descarta al arrancar (MiddlewareNotUsed) y no cuesta nada por request.
+Activo, envuelve las conexiones con un execute_wrapper durante la vista,
+agrega la cabecera Server-Timing (visible en las herramientas del
+navegador) y suma el request al registro del proceso:
+
+  - un histograma acumulado por nombre de URL (para Prometheus, /metrics),
+  - las últimas N duraciones por nombre, para p50/p95 en /panel/metrics/.
+
+Cada proceso lleva su propio registro: con varios workers de gunicorn,
+Prometheus ve una serie por proceso (por eso sirve también el texto).
+
+Las consultas más lentas que TIENDA_METRICAS_SQL_LENTA_MS se registran en el
+logger "tienda.metricas". El middleware es síncrono: con las vistas de
+views_async las consultas corren en otros hilos y no se ven desde acá.
+"""
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# límites (segundos) de los buckets del histograma, como los de Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MUESTRAS = 500   # duraciones recientes por vista para los percentiles del panel
+
+
+# --------- MEDICIÓN DE CONSULTAS ----------
+class Medidor:
+    """execute_wrapper que cuenta y cronometra las consultas de un request."""
+    def __init__(self, lenta_ms):
+        self.lenta = lenta_ms / 1000
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.firmas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            dt = time.perf_counter() - t0
+            self.consultas += 1
+            self.tiempo += dt
+            self.firmas[(sql, repr(params))] += 1
+            if dt >= self.lenta:
+                logger.warning("Consulta lenta (%.1f ms): %s", dt * 1000, sql)
+
+    @property
+    def duplicadas(self):
+        """Consultas que repiten exactamente otra del mismo request (mismo SQL y parámetros)."""
+        return self.consultas - len(self.firmas)
+
+    def mas_repetida(self):
+        if not self.firmas:
+            return None
+        (sql, _), veces = self.firmas.most_common(1)[0]
+        return (sql, veces) if veces > 1 else None
+
+
+# --------- REGISTRO DEL PROCESO ----------
+class _Serie:
+    def __init__(self):
+        self.n = 0
+        self.suma = 0.0
+        self.suma_db = 0.0
+        self.consultas = 0
+        self.duplicadas = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.recientes = deque(maxlen=MUESTRAS)
+        self.repetida = None   # (sql, veces) de la última vez que hubo repetidas
+
+    def sumar(self, dur, dur_db, consultas, duplicadas, repetida):
+        self.n += 1
+        self.suma += dur
+        self.suma_db += dur_db
+        self.consultas += consultas
+        self.duplicadas += duplicadas
+        for i, limite in enumerate(BUCKETS):
+            if dur <= limite:
+                self.buckets[i] += 1
+        self.recientes.append(dur)
+        if repetida:
+            self.repetida = repetida
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Registro:
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._series = {}
+
+    def registrar(self, vista, dur, medidor):
+        with self._candado:
+            serie = self._series.setdefault(vista, _Serie())
+            serie.sumar(dur, medidor.tiempo, medidor.consultas, medidor.duplicadas, medidor.mas_repetida())
+
+    def reiniciar(self):
+        with self._candado:
+            self._series.clear()
+
+    def resumen(self):
+        """Una fila por vista (para el panel), la más lenta en p95 primero."""
+        with self._candado:
+            filas = []
+            for vista, s in self._series.items():
+                recientes = sorted(s.recientes)
+                filas.append({
+                    "vista": vista, "n": s.n,
+                    "p50_ms": _percentil(recientes, 50) * 1000,
+                    "p95_ms": _percentil(recientes, 95) * 1000,
+                    "max_ms": (recientes[-1] if recientes else 0.0) * 1000,
+                    "db_ms": s.suma_db / s.n * 1000,
+                    "consultas": s.consultas / s.n,
+                    "duplicadas": s.duplicadas / s.n,
+                    "repetida": s.repetida,
+                })
+        return sorted(filas, key=lambda f: f["p95_ms"], reverse=True)
+
+    def prometheus(self):
+        """Formato de texto de Prometheus (version 0.0.4)."""
+        lineas = [
+            "# HELP tienda_request_segundos Duración de los requests por vista.",
+            "# TYPE tienda_request_segundos histogram",
+        ]
+        otras = {
+            "tienda_db_segundos_total": ("counter", "Tiempo en la base por vista.", "suma_db"),
+            "tienda_consultas_total": ("counter", "Consultas SQL por vista.", "consultas"),
+            "tienda_consultas_duplicadas_total": ("counter", "Consultas repetidas en el mismo request.", "duplicadas"),
+        }
+        with self._candado:
+            series = sorted(self._series.items())
+            for vista, s in series:
+                etiqueta = _etiqueta(vista)
+                for limite, n in zip(BUCKETS, s.buckets):
+                    lineas.append(f'tienda_request_segundos_bucket{{vista="{etiqueta}",le="{limite}"}} {n}')
+                lineas.append(f'tienda_request_segundos_bucket{{vista="{etiqueta}",le="+Inf"}} {s.n}')
+                lineas.append(f'tienda_request_segundos_sum{{vista="{etiqueta}"}} {s.suma:.6f}')
+                lineas.append(f'tienda_request_segundos_count{{vista="{etiqueta}"}} {s.n}')
+            for nombre, (tipo, ayuda, campo) in otras.items():
+                lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+                for vista, s in series:
+                    lineas.append(f'{nombre}{{vista="{_etiqueta(vista)}"}} {getattr(s, campo)}')
+        return "\n".join(lineas) + "\n"
+
+
+def _etiqueta(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registro = Registro()
+
+
+# --------- MIDDLEWARE ----------
+def activas():
+    return getattr(settings, "TIENDA_METRICAS", False)
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        if not activas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lenta_ms = getattr(settings, "TIENDA_METRICAS_SQL_LENTA_MS", 100)
+
+    def __call__(self, request):
+        medidor = Medidor(self.lenta_ms)
+        t0 = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(medidor))
+            respuesta = self.get_response(request)
+        dur = time.perf_counter() - t0
+
+        coincidencia = getattr(request, "resolver_match", None)
+        vista = (coincidencia.view_name if coincidencia else None) or "sin_ruta"
+        registro.registrar(vista, dur, medidor)
+
+        respuesta["Server-Timing"] = (
+            f'app;dur={dur * 1000:.1f}, '
+            f'db;dur={medidor.tiempo * 1000:.1f};desc="{medidor.consultas} consultas, {medidor.duplicadas} repetidas"'
+        )
+        return respuesta
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0008_pedido_numero_usuario'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['creado', 'id'], name='producto_creado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['precio', 'id'], name='producto_precio_id_idx'),
+        ),
+    ]
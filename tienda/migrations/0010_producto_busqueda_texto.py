@@ -0,0 +1,83 @@
+# Índice de búsqueda de texto completo para Producto.
+#  - PostgreSQL: columna tsvector + trigger + índice GIN (config es_unaccent).
+#  - SQLite: tabla virtual FTS5 que se sincroniza desde signals.py.
+
+from django.db import migrations
+
+PG_CREAR = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+    CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+    ALTER TEXT SEARCH CONFIGURATION es_unaccent
+      ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+  END IF;
+END
+$$;
+
+ALTER TABLE tienda_producto ADD COLUMN busqueda tsvector;
+
+CREATE FUNCTION tienda_producto_busqueda() RETURNS trigger AS $$
+BEGIN
+  NEW.busqueda :=
+    setweight(to_tsvector('es_unaccent', coalesce(NEW.nombre, '')), 'A') ||
+    setweight(to_tsvector('es_unaccent', coalesce(NEW.resumen, '')), 'B') ||
+    setweight(to_tsvector('es_unaccent', coalesce(NEW.descripcion, '')), 'C');
+  RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tienda_producto_busqueda_trg
+  BEFORE INSERT OR UPDATE OF nombre, resumen, descripcion ON tienda_producto
+  FOR EACH ROW EXECUTE FUNCTION tienda_producto_busqueda();
+
+UPDATE tienda_producto SET nombre = nombre;
+
+CREATE INDEX tienda_producto_busqueda_gin ON tienda_producto USING gin (busqueda);
+"""
+
+PG_BORRAR = """
+DROP TRIGGER IF EXISTS tienda_producto_busqueda_trg ON tienda_producto;
+DROP FUNCTION IF EXISTS tienda_producto_busqueda();
+DROP INDEX IF EXISTS tienda_producto_busqueda_gin;
+ALTER TABLE tienda_producto DROP COLUMN IF EXISTS busqueda;
+"""
+
+SQLITE_CREAR = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tienda_producto_fts USING fts5("
+    "nombre, resumen, descripcion, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO tienda_producto_fts (rowid, nombre, resumen, descripcion) "
+    "SELECT id, nombre, resumen, descripcion FROM tienda_producto",
+]
+
+SQLITE_BORRAR = ["DROP TABLE IF EXISTS tienda_producto_fts"]
+
+
+def _ejecutar(schema_editor, pg, sqlite):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(pg)
+    elif vendor == "sqlite":
+        for sql in sqlite:
+            schema_editor.execute(sql)
+
+
+def crear_indice(apps, schema_editor):
+    _ejecutar(schema_editor, PG_CREAR, SQLITE_CREAR)
+
+
+def borrar_indice(apps, schema_editor):
+    _ejecutar(schema_editor, PG_BORRAR, SQLITE_BORRAR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0009_producto_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def numerar_pedidos(apps, schema_editor):
+    """
+    Deja numero_usuario único por usuario y crea su contador.
+    Los números ya asignados se respetan; los pedidos en 0 (anteriores a la
+    0008) o repetidos por checkouts simultáneos reciben números nuevos a
+    continuación del máximo, en orden de creación.
+
+    Los máximos salen de un agregado y solo se recorren (por lotes) los
+    pedidos de los usuarios que tienen algo que renumerar.
+    """
+    Pedido = apps.get_model("tienda", "Pedido")
+    ContadorPedidos = apps.get_model("tienda", "ContadorPedidos")
+    db = schema_editor.connection.alias
+    pedidos = Pedido.objects.using(db).filter(usuario__isnull=False)
+
+    # (usuario, número) en 0 o repetidos
+    grupos = (
+        pedidos.order_by().values("usuario_id", "numero_usuario").annotate(n=models.Count("id"))
+        .filter(models.Q(numero_usuario=0) | models.Q(n__gt=1))
+    )
+    afectados = sorted({g["usuario_id"] for g in grupos})
+
+    ultimos = {}
+    for usuario_id in afectados:
+        qs = pedidos.filter(usuario_id=usuario_id)
+        ultimo = qs.aggregate(m=models.Max("numero_usuario"))["m"]
+        vistos = set()
+        renumerar = []
+        for ped in qs.order_by("creado", "id").only("id", "numero_usuario").iterator(chunk_size=2000):
+            if ped.numero_usuario == 0 or ped.numero_usuario in vistos:
+                ultimo += 1
+                ped.numero_usuario = ultimo
+                renumerar.append(ped)
+            vistos.add(ped.numero_usuario)
+            if len(renumerar) >= 500:
+                Pedido.objects.using(db).bulk_update(renumerar, ["numero_usuario"])
+                renumerar = []
+        Pedido.objects.using(db).bulk_update(renumerar, ["numero_usuario"], batch_size=500)
+        ultimos[usuario_id] = ultimo
+
+    contadores = []
+    maximos = pedidos.order_by().values("usuario_id").annotate(m=models.Max("numero_usuario"))
+    for fila in maximos.iterator(chunk_size=2000):
+        usuario_id = fila["usuario_id"]
+        contadores.append(ContadorPedidos(usuario_id=usuario_id, ultimo=ultimos.get(usuario_id, fila["m"])))
+        if len(contadores) >= 500:
+            ContadorPedidos.objects.using(db).bulk_create(contadores)
+            contadores = []
+    ContadorPedidos.objects.using(db).bulk_create(contadores)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tienda', '0010_producto_busqueda_texto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorPedidos',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'contador de pedidos',
+                'verbose_name_plural': 'contadores de pedidos',
+            },
+        ),
+        migrations.RunPython(numerar_pedidos, migrations.RunPython.noop),
+    ]
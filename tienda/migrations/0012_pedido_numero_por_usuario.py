@@ -0,0 +1,20 @@
+# La restricción va en su propia migración (y transacción) para que en
+# Postgres no choque con los eventos pendientes del relleno de la 0011.
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0011_contador_pedidos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='pedido',
+            constraint=models.UniqueConstraint(fields=('usuario', 'numero_usuario'), name='pedido_numero_por_usuario'),
+        ),
+    ]
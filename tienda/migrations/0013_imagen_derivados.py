@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0012_pedido_numero_por_usuario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='imagen_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_derivados',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0014_tarea'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['creado', 'id'], name='pedido_creado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['usuario', 'creado'], name='pedido_usuario_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['descuento', 'creado'], name='pedido_descuento_creado_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0015_pedido_indices_panel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaCupon',
+            fields=[
+                ('descuento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='tienda.descuento')),
+                ('pedidos', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(unique=True)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['-dia'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('pedidos', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tienda.producto')),
+            ],
+            options={
+                'ordering': ['-dia'],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'producto'), name='venta_producto_dia')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0016_resumenes_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('veces', models.PositiveIntegerField(help_text='Pedidos que llevaron los dos productos')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tienda.producto')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionado_en', to='tienda.producto')),
+            ],
+            options={
+                'verbose_name': 'producto relacionado',
+                'verbose_name_plural': 'productos relacionados',
+                'ordering': ['producto', '-veces'],
+                'indexes': [models.Index(fields=['producto', '-veces'], name='relacionado_producto_veces_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'relacionado'), name='relacionado_unico')],
+            },
+        ),
+    ]
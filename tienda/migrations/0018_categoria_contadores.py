@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:11
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q
+
+
+def contar(apps, schema_editor):
+    """Valores iniciales de los contadores (luego los mantiene tienda/contadores.py)."""
+    Categoria = apps.get_model("tienda", "Categoria")
+    Producto = apps.get_model("tienda", "Producto")
+    db = schema_editor.connection.alias
+
+    disponibles = Q(disponible=True)
+    filas = (
+        Producto.objects.using(db).exclude(categoria=None).values("categoria_id")
+        .annotate(n=Count("id", filter=disponibles), pmin=Min("precio", filter=disponibles),
+                  pmax=Max("precio", filter=disponibles))
+        .order_by()
+    )
+    for f in filas:
+        Categoria.objects.using(db).filter(pk=f["categoria_id"]).update(
+            productos_disponibles=f["n"], precio_min=f["pmin"], precio_max=f["pmax"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0017_productos_relacionados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='precio_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='precio_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='productos_disponibles',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Marca de tiempo de Categoria: el ETag de /api/categorias/ sale de los datos
+# (Max(actualizado) + Count) y no de un contador en la caché de cada proceso.
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tienda', '0019_movimientos_venta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -15,6 +15,14 @@ class Categoria(models.Model):
     nombre = models.CharField(max_length=60, unique=True)
     slug = models.SlugField(max_length=70, unique=True, blank=True)
     imagen = models.ImageField(upload_to="categorias/", null=True, blank=True)
+    # rutas de las versiones reducidas (ver tienda/imagenes.py)
+    imagen_derivados = models.JSONField(default=dict, blank=True, editable=False)
+    # resumen de sus productos disponibles, mantenido por tienda/contadores.py
+    productos_disponibles = models.PositiveIntegerField(default=0, editable=False)
+    precio_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    precio_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    # también lo marcan los recuentos de contadores.py (validador de la API)
+    actualizado = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["nombre"]
@@ -35,6 +43,7 @@ class Producto(models.Model):
     nombre = models.CharField(max_length=120, unique=True)
     descripcion = models.TextField(blank=True)
     imagen = models.ImageField(upload_to="productos/", null=True, blank=True)
+    imagen_derivados = models.JSONField(default=dict, blank=True, editable=False)
     precio = models.DecimalField(
         max_digits=10, decimal_places=2,
         validators=[MinValueValidator(Decimal("0.00"))]
@@ -70,6 +79,9 @@ class Producto(models.Model):
         indexes = [
             models.Index(fields=["disponible", "stock"]),
             models.Index(fields=["nombre"]),
+            # paginación por cursor del catálogo: (campo de orden, id)
+            models.Index(fields=["creado", "id"], name="producto_creado_id_idx"),
+            models.Index(fields=["precio", "id"], name="producto_precio_id_idx"),
         ]
         constraints = [
             models.CheckConstraint(check=Q(precio__gte=0), name="producto_precio_no_negativo"),
@@ -130,21 +142,50 @@ class Pedido(models.Model):
 
     class Meta:
         ordering = ["-creado"]
-        indexes = [models.Index(fields=["estado", "creado"])]
+        indexes = [
+            models.Index(fields=["estado", "creado"]),
+            # listado del panel: paginación por (creado, id) y filtros por cliente / cupón
+            models.Index(fields=["creado", "id"], name="pedido_creado_id_idx"),
+            models.Index(fields=["usuario", "creado"], name="pedido_usuario_creado_idx"),
+            models.Index(fields=["descuento", "creado"], name="pedido_descuento_creado_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "numero_usuario"], name="pedido_numero_por_usuario"),
+        ]
+
+    def aplicar_descuento(self, subtotal):
+        """Total a pagar para un subtotal dado, con el cupón (si está activo)."""
+        if self.descuento and self.descuento.activo:
+            subtotal = subtotal * (Decimal("100") - Decimal(self.descuento.porcentaje)) / Decimal("100")
+        return subtotal.quantize(Decimal("0.01"))
 
     def recomputar_total(self):
         subtotal = self.detalles.aggregate(
             s=Sum(F("precio_unitario") * F("cantidad"), output_field=DecimalField(max_digits=12, decimal_places=2))
         )["s"] or Decimal("0.00")
-        if self.descuento and self.descuento.activo:
-            subtotal = subtotal * (Decimal("100") - Decimal(self.descuento.porcentaje)) / Decimal("100")
-        self.total = subtotal.quantize(Decimal("0.01"))
+        self.total = self.aplicar_descuento(subtotal)
         return self.total
 
     def __str__(self):
         return f"Pedido #{self.id} · {self.usuario} · {self.estado}"
 
 
+# ----------------- CONTADOR DE PEDIDOS POR USUARIO -----------------
+class ContadorPedidos(models.Model):
+    """Último `numero_usuario` entregado a cada usuario (una fila por usuario)."""
+    usuario = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, on_delete=models.CASCADE, related_name="+"
+    )
+    ultimo = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "contador de pedidos"
+        verbose_name_plural = "contadores de pedidos"
+
+    def __str__(self):
+        return f"{self.usuario_id} → {self.ultimo}"
+
+
 # ----------------- DETALLE DE PEDIDO -----------------
 class DetallePedido(models.Model):
     pedido = models.ForeignKey(Pedido, related_name="detalles", on_delete=models.CASCADE)
@@ -181,3 +222,120 @@ class DetallePedido(models.Model):
 
     def __str__(self):
         return f"{self.cantidad} × {self.producto.nombre}"
+
+
+# ----------------- COLA DE TAREAS -----------------
+class Tarea(models.Model):
+    """Trabajo diferido para `manage.py run_worker` (ver tienda/tareas.py)."""
+    PENDIENTE, EN_CURSO, HECHA, FALLIDA = "PENDIENTE", "EN_CURSO", "HECHA", "FALLIDA"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_CURSO, "En curso"),
+        (HECHA, "Hecha"),
+        (FALLIDA, "Fallida"),
+    ]
+    nombre = models.CharField(max_length=80)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    tomada = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(default=timezone.now)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-creado"]
+        # el worker busca siempre "pendientes cuyo turno ya llegó"
+        indexes = [models.Index(fields=["estado", "ejecutar_desde"], name="tarea_estado_turno_idx")]
+
+    def __str__(self):
+        return f"{self.nombre} #{self.id} · {self.estado}"
+
+
+# ----------------- RESÚMENES DE VENTAS -----------------
+# Tablas acumuladas que mantiene tienda/resumenes.py: el panel lee de acá en
+# vez de agregar sobre DetallePedido. Los pedidos CANCELADOS no suman.
+class VentaDiaria(models.Model):
+    dia = models.DateField(unique=True)
+    pedidos = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-dia"]
+
+    def __str__(self):
+        return f"{self.dia} · {self.pedidos} pedidos"
+
+
+class VentaProducto(models.Model):
+    """Ventas de un producto en un día (ingresos antes del cupón)."""
+    dia = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    pedidos = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["-dia"]
+        constraints = [models.UniqueConstraint(fields=["dia", "producto"], name="venta_producto_dia")]
+
+    def __str__(self):
+        return f"{self.dia} · {self.producto_id} · {self.unidades} u."
+
+
+class VentaCupon(models.Model):
+    descuento = models.OneToOneField(Descuento, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    pedidos = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.descuento_id} · {self.pedidos} pedidos"
+
+
+class MovimientoVenta(models.Model):
+    """
+    Aporte de un pedido (o de su cancelación, con signo negativo) todavía sin
+    sumar a las tablas de arriba. El checkout solo inserta filas propias; el
+    worker las consolida (resumenes.consolidar). La fila sin producto lleva
+    los totales del pedido y su cupón; hay una más por cada línea.
+    """
+    dia = models.DateField()
+    producto = models.ForeignKey(Producto, null=True, blank=True, on_delete=models.CASCADE, related_name="+")
+    descuento = models.ForeignKey(Descuento, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    pedidos = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "movimiento de venta"
+        verbose_name_plural = "movimientos de venta"
+
+    def __str__(self):
+        return f"{self.dia} · {self.producto_id or 'pedido'} · {self.pedidos:+d}"
+
+
+# ----------------- PRODUCTOS RELACIONADOS -----------------
+class ProductoRelacionado(models.Model):
+    """
+    Los vecinos más comprados junto con cada producto ("comprados juntos").
+    La tabla entera se recalcula en lote (tienda/relacionados.py); solo se
+    guardan los primeros relacionados.GUARDADOS por producto.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    relacionado = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="relacionado_en")
+    veces = models.PositiveIntegerField(help_text="Pedidos que llevaron los dos productos")
+
+    class Meta:
+        ordering = ["producto", "-veces"]
+        verbose_name = "producto relacionado"
+        verbose_name_plural = "productos relacionados"
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "relacionado"], name="relacionado_unico"),
+        ]
+        indexes = [models.Index(fields=["producto", "-veces"], name="relacionado_producto_veces_idx")]
+
+    def __str__(self):
+        return f"{self.producto_id} → {self.relacionado_id} ({self.veces})"
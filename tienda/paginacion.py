@@ -0,0 +1,123 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En vez de OFFSET, cada página se pide "a partir de" la última fila vista,
+usando el campo de orden más el id como desempate. Así la página N cuesta
+lo mismo que la página 1 (un rango sobre el índice).
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Q
+
+
+class PaginaKeyset:
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente   # cursor para la página siguiente (o None)
+        self.anterior = anterior     # cursor para la página anterior (o None)
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras(self):
+        return bool(self.siguiente or self.anterior)
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def codificar_cursor(orden, valor, pk, direccion):
+    data = json.dumps(
+        {"o": orden, "v": _serializar(valor), "id": pk, "d": direccion}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, qs, orden):
+    """
+    Devuelve el dict del cursor con el valor ya convertido al tipo del campo,
+    o None si viene vacío, adulterado o es de otro orden (p. ej. un enlace viejo).
+    """
+    if not cursor:
+        return None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if data.get("o") != orden or data.get("d") not in ("s", "a") or not isinstance(data.get("id"), int):
+            return None
+        campo = qs.query.resolve_ref(orden.lstrip("-")).output_field
+        data["v"] = campo.to_python(data["v"])
+        return data
+    except (ValueError, TypeError, AttributeError, KeyError, ValidationError, FieldError):
+        return None
+
+
+def _consulta(qs, orden, cursor, por_pagina):
+    """Queryset de la página (por_pagina + 1 filas, para saber si hay más) y la posición del cursor."""
+    campo = orden.lstrip("-")
+    desc = orden.startswith("-")
+
+    pos = decodificar_cursor(cursor, qs, orden)
+    hacia_atras = pos is not None and pos["d"] == "a"
+    # para retroceder se recorre el orden inverso y luego se da vuelta la página
+    desc_efectivo = desc != hacia_atras
+
+    if pos is not None:
+        op = "lt" if desc_efectivo else "gt"
+        cota = "lte" if desc_efectivo else "gte"
+        qs = qs.filter(**{f"{campo}__{cota}": pos["v"]}).filter(
+            Q(**{f"{campo}__{op}": pos["v"]}) | Q(**{campo: pos["v"], f"id__{op}": pos["id"]})
+        )
+
+    signo = "-" if desc_efectivo else ""
+    return qs.order_by(f"{signo}{campo}", f"{signo}id")[:por_pagina + 1], pos
+
+
+def _armar(filas, orden, pos, por_pagina):
+    campo = orden.lstrip("-")
+    hacia_atras = pos is not None and pos["d"] == "a"
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    if not filas:
+        return PaginaKeyset([])
+
+    primero, ultimo = filas[0], filas[-1]
+    if hacia_atras:
+        siguiente = codificar_cursor(orden, getattr(ultimo, campo), ultimo.id, "s")
+        anterior = codificar_cursor(orden, getattr(primero, campo), primero.id, "a") if hay_mas else None
+    else:
+        siguiente = codificar_cursor(orden, getattr(ultimo, campo), ultimo.id, "s") if hay_mas else None
+        anterior = codificar_cursor(orden, getattr(primero, campo), primero.id, "a") if pos else None
+
+    return PaginaKeyset(filas, siguiente=siguiente, anterior=anterior)
+
+
+def paginar_keyset(qs, orden, cursor=None, por_pagina=24):
+    """
+    Pagina `qs` ordenado por `orden` (p. ej. "-creado" o "precio") con `id`
+    como desempate en la misma dirección. `cursor` es el valor que entrega
+    la página previa en `siguiente` / `anterior`.
+
+    `orden` puede ser un campo del modelo o una anotación del queryset.
+    """
+    pagina, pos = _consulta(qs, orden, cursor, por_pagina)
+    return _armar(list(pagina), orden, pos, por_pagina)
+
+
+async def apaginar_keyset(qs, orden, cursor=None, por_pagina=24):
+    """Igual que paginar_keyset, con el ORM asíncrono (para las vistas de views_async)."""
+    pagina, pos = _consulta(qs, orden, cursor, por_pagina)
+    return _armar([obj async for obj in pagina], orden, pos, por_pagina)
@@ -0,0 +1,180 @@
+"""
+Creación de pedidos (la parte de escritura del checkout).
+
+En modo "bloqueo" el trabajo dentro de la transacción es de costo constante,
+sin importar cuántas líneas tenga el carrito:
+  1. SELECT ... FOR UPDATE de los productos del carrito
+  2. un UPDATE en bloque del stock/disponible
+  3. número correlativo del usuario (un UPDATE sobre su fila de contador)
+  4. INSERT del pedido (con el total ya calculado en Python)
+  5. un INSERT en bloque de las líneas
+  6. INSERT de la tarea del correo de confirmación (la envía el worker)
+  7. solo si algún producto se agotó, recuento de sus categorías (un UPDATE;
+     ver contadores.py)
+  8. INSERT en bloque de los movimientos de venta del pedido (filas propias:
+     el worker los suma después a los resúmenes con la tarea
+     "resumenes.consolidar", que se encola si no hay una pendiente)
+
+En modo "condicional" el paso 1-2 se reemplaza por un UPDATE condicional por
+producto, sin bloquear filas de antemano, y el paso 7 se hace siempre (el
+UPDATE solo toca las categorías de los que quedaron en 0).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import contadores, resumenes, tareas
+from .models import ContadorPedidos, Producto, Pedido, DetallePedido
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, nombre, disponible):
+        self.nombre = nombre
+        self.disponible = disponible
+        super().__init__(f"No hay stock suficiente de '{nombre}'. Disponible: {disponible}.")
+
+
+def _reservar_con_bloqueo(cantidades, nombres, ahora):
+    bloqueados = Producto.objects.select_for_update().filter(id__in=cantidades).in_bulk()
+
+    for pid, cantidad in cantidades.items():
+        p = bloqueados.get(pid)
+        if p is None or p.stock < cantidad:
+            raise StockInsuficiente(nombres[pid], p.stock if p else 0)
+
+    for pid, cantidad in cantidades.items():
+        p = bloqueados[pid]
+        p.stock -= cantidad
+        if p.stock == 0:
+            p.disponible = False
+        p.actualizado = ahora  # bulk_update no aplica auto_now
+
+    Producto.objects.bulk_update(list(bloqueados.values()), ["stock", "disponible", "actualizado"])
+    return bloqueados, [pid for pid, p in bloqueados.items() if p.stock == 0]
+
+
+def _reservar_condicional(cantidades, nombres, ahora):
+    """
+    Sin bloqueo explícito: un UPDATE ... WHERE stock >= n por producto.
+    Si alguna fila no se actualiza, otro comprador se llevó el stock; la
+    excepción deshace los descuentos previos al salir del atomic().
+    """
+    productos = Producto.objects.filter(id__in=cantidades).in_bulk()
+
+    for pid, cantidad in cantidades.items():
+        filas = Producto.objects.filter(pk=pid, stock__gte=cantidad).update(
+            stock=F("stock") - cantidad,
+            # en el SET, `stock` todavía es el valor previo: queda en 0 si era == cantidad
+            disponible=Case(When(stock=cantidad, then=Value(False)), default=F("disponible")),
+            actualizado=ahora,
+        )
+        if filas == 0:
+            actual = Producto.objects.filter(pk=pid).values_list("stock", flat=True).first()
+            raise StockInsuficiente(nombres[pid], actual or 0)
+
+    # sin las filas bloqueadas no se sabe cuáles quedaron en 0 (None = mirar en la base)
+    return productos, None
+
+
+def _admite_update_returning():
+    """UPDATE ... RETURNING: PostgreSQL y SQLite >= 3.35 (MySQL/MariaDB no lo tienen)."""
+    if connection.vendor == "postgresql":
+        return True
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def siguiente_numero(usuario):
+    """
+    Próximo `numero_usuario` del usuario, incrementando su fila de
+    ContadorPedidos con la fila bloqueada (eso además serializa dos checkouts
+    del mismo usuario). Debe llamarse dentro de la transacción del pedido.
+    """
+    if _admite_update_returning():
+        # incremento y lectura en una sola ida
+        tabla = connection.ops.quote_name(ContadorPedidos._meta.db_table)
+        with connection.cursor() as cur:
+            cur.execute(
+                f"UPDATE {tabla} SET ultimo = ultimo + 1 WHERE usuario_id = %s RETURNING ultimo",
+                [usuario.pk],
+            )
+            fila = cur.fetchone()
+        if fila:
+            return fila[0]
+    else:
+        contador = ContadorPedidos.objects.select_for_update().filter(usuario=usuario).first()
+        if contador is not None:
+            contador.ultimo += 1
+            contador.save(update_fields=["ultimo"])
+            return contador.ultimo
+
+    # primer pedido del usuario
+    try:
+        with transaction.atomic():
+            ContadorPedidos.objects.create(usuario=usuario, ultimo=1)
+        return 1
+    except IntegrityError:
+        # otro checkout del mismo usuario creó la fila justo antes
+        contador = ContadorPedidos.objects.select_for_update().get(usuario=usuario)
+        contador.ultimo += 1
+        contador.save(update_fields=["ultimo"])
+        return contador.ultimo
+
+
+MODOS_RESERVA = {
+    "bloqueo": _reservar_con_bloqueo,
+    "condicional": _reservar_condicional,
+}
+
+
+def crear_pedido(usuario, items, cupon=None, modo=None):
+    """
+    Crea el pedido a partir de los `items` del carrito (ver Cart.items()),
+    descontando stock. Lanza StockInsuficiente si algún producto no alcanza;
+    en ese caso no queda nada escrito.
+
+    `modo` elige cómo se reserva el stock (por defecto settings.TIENDA_RESERVA_STOCK):
+    "bloqueo" toma SELECT ... FOR UPDATE; "condicional" usa decrementos
+    condicionales y no deja a los compradores del mismo producto en fila.
+    """
+    reservar = MODOS_RESERVA[modo or getattr(settings, "TIENDA_RESERVA_STOCK", "bloqueo")]
+    cantidades = {it["producto"].id: it["cantidad"] for it in items}
+    nombres = {it["producto"].id: it["producto"].nombre for it in items}
+
+    with transaction.atomic():
+        productos, agotados = reservar(cantidades, nombres, timezone.now())
+
+        numero = siguiente_numero(usuario)
+
+        subtotal = Decimal("0.00")
+        detalles = []
+        for pid, cantidad in cantidades.items():
+            p = productos[pid]
+            # precio tomado de la fila leída en la transacción, no del carrito
+            detalles.append(DetallePedido(producto=p, cantidad=cantidad, precio_unitario=p.precio))
+            subtotal += p.precio * cantidad
+
+        pedido = Pedido(usuario=usuario, descuento=cupon, estado="PENDIENTE", numero_usuario=numero)
+        pedido.total = pedido.aplicar_descuento(subtotal)
+        pedido.save()
+
+        for d in detalles:
+            d.pedido = pedido
+        DetallePedido.objects.bulk_create(detalles)
+
+        # misma transacción que el pedido: si algo falla no queda un correo huérfano
+        tareas.encolar("pedidos.correo_confirmacion", pedido_id=pedido.id)
+
+        # los que quedaron en 0 dejan de contar como disponibles en su categoría
+        if agotados is None:
+            contadores.recontar_agotados(list(cantidades))
+        elif agotados:
+            contadores.recontar_de_productos(agotados)
+
+        resumenes.registrar(resumenes.huella(pedido, detalles))
+
+    return pedido
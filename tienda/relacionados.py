@@ -0,0 +1,119 @@
+"""
+Productos relacionados para la ficha de producto.
+
+  - "Comprados juntos": vecinos por co-compra, precalculados en lote sobre
+    DetallePedido y guardados en ProductoRelacionado (los GUARDADOS primeros
+    de cada producto). `recalcular()` lo corre manage.py
+    recalcular_relacionados (cron) o la tarea "catalogo.relacionados".
+  - "Más de la categoría": los más recientes de la misma categoría.
+
+`para_producto(p)` arma los dos bloques con una consulta cada uno (ninguna
+si el producto no tiene categoría) y los deja en caché bajo la versión
+RELACIONADOS, que sube al editar productos o al recalcular la tabla.
+"""
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from . import versiones
+from .models import DetallePedido, Pedido, Producto, ProductoRelacionado
+
+GUARDADOS = 12         # vecinos por producto en la tabla (sobran por si alguno se agota)
+MOSTRAR = 4            # tarjetas por bloque en la ficha
+RELACIONADOS_TTL = 60 * 10
+
+# lo que usan las tarjetas chicas de la ficha
+CAMPOS_TARJETA = ["id", "nombre", "precio", "resumen", "imagen", "imagen_derivados", "disponible"]
+
+
+# --------- CÁLCULO EN LOTE ----------
+def _pares(top, minimo, desde=None):
+    """(producto, relacionado, veces) de los `top` vecinos de cada producto, en una consulta."""
+    qn = connection.ops.quote_name
+    detalle = qn(DetallePedido._meta.db_table)
+    pedido = qn(Pedido._meta.db_table)
+    filtro_fecha = f"AND p.{qn('creado')} >= %s" if desde else ""
+    # cada pedido tiene a lo sumo una línea por producto: COUNT(*) = pedidos que llevaron ambos
+    sql = f"""
+        SELECT producto_id, relacionado_id, veces FROM (
+            SELECT a.producto_id, b.producto_id AS relacionado_id, COUNT(*) AS veces,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY a.producto_id ORDER BY COUNT(*) DESC, b.producto_id
+                   ) AS puesto
+            FROM {detalle} a
+            JOIN {detalle} b ON b.pedido_id = a.pedido_id AND b.producto_id <> a.producto_id
+            JOIN {pedido} p ON p.id = a.pedido_id
+            WHERE p.estado <> %s {filtro_fecha}
+            GROUP BY a.producto_id, b.producto_id
+            HAVING COUNT(*) >= %s
+        ) pares
+        WHERE puesto <= %s
+    """
+    params = ["CANCELADO", *([desde] if desde else []), minimo, top]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while filas := cursor.fetchmany(2000):
+            yield from filas
+
+
+def recalcular(top=GUARDADOS, minimo=1, desde=None, lote=1000):
+    """
+    Reemplaza ProductoRelacionado con los pares de co-compra de los pedidos no
+    cancelados (desde `desde`, si se indica). Devuelve cuántas filas quedaron.
+    """
+    with transaction.atomic():
+        ProductoRelacionado.objects.all().delete()
+        creadas = ProductoRelacionado.objects.bulk_create(
+            (ProductoRelacionado(producto_id=a, relacionado_id=b, veces=n) for a, b, n in _pares(top, minimo, desde)),
+            batch_size=lote,
+        )
+        transaction.on_commit(lambda: versiones.invalidar(versiones.RELACIONADOS))
+    return len(creadas)
+
+
+# --------- LECTURA (ficha) ----------
+def _comprados_juntos(p, n):
+    return (
+        Producto.objects.filter(relacionado_en__producto=p, disponible=True)
+        .order_by("-relacionado_en__veces", "id").only(*CAMPOS_TARJETA)[:n]
+    )
+
+
+def _misma_categoria(p, n, excluir):
+    return (
+        Producto.objects.filter(categoria_id=p.categoria_id, disponible=True)
+        .exclude(pk__in=[p.pk, *excluir]).order_by("-creado", "-id").only(*CAMPOS_TARJETA)[:n]
+    )
+
+
+def _clave(p, n, version):
+    return f"tienda:relacionados:{version}:{p.pk}:{n}"
+
+
+def para_producto(p, n=MOSTRAR):
+    """{"comprados_juntos": [...], "misma_categoria": [...]} para la ficha de `p`."""
+    clave = _clave(p, n, versiones.version(versiones.RELACIONADOS))
+    bloques = cache.get(clave)
+    if bloques is None:
+        juntos = list(_comprados_juntos(p, n))
+        bloques = {
+            "comprados_juntos": juntos,
+            # sin repetir lo que ya aparece arriba
+            "misma_categoria": list(_misma_categoria(p, n, [r.pk for r in juntos])) if p.categoria_id else [],
+        }
+        cache.set(clave, bloques, RELACIONADOS_TTL)
+    return bloques
+
+
+async def apara_producto(p, n=MOSTRAR):
+    """Igual que para_producto(), con el ORM y la caché asíncronos (vistas ASGI)."""
+    clave = _clave(p, n, await versiones.aversion(versiones.RELACIONADOS))
+    bloques = await cache.aget(clave)
+    if bloques is None:
+        juntos = [r async for r in _comprados_juntos(p, n)]
+        misma = _misma_categoria(p, n, [r.pk for r in juntos]) if p.categoria_id else None
+        bloques = {
+            "comprados_juntos": juntos,
+            "misma_categoria": [r async for r in misma] if misma is not None else [],
+        }
+        await cache.aset(clave, bloques, RELACIONADOS_TTL)
+    return bloques
@@ -0,0 +1,171 @@
+"""
+Lecturas en la réplica (settings.TIENDA_REPLICA, con DATABASE_REPLICA_URL).
+
+Solo se van a la réplica las consultas de modelos de la tienda hechas
+dentro de una vista marcada con @solo_lectura (catálogo, ficha, perfil,
+listados y reportes del panel) y solo en GET/HEAD; todo lo demás, y en
+particular el checkout y los cambios del panel, usa la base principal.
+
+La réplica puede ir unos segundos atrasada, así que tras una escritura se
+lee de la principal:
+  - en el mismo request, desde la primera escritura (el router la ve pasar);
+  - en los siguientes, mientras dure la cookie que deja ReplicaMiddleware
+    (TIENDA_REPLICA_FIJAR segundos), para que quien acaba de guardar vea
+    su cambio en la página a la que lo redirigen.
+
+Lo que se evalúa después de que la vista devuelve (p. ej. los generadores
+de una respuesta en streaming) ya no ve el estado del request: esos
+querysets se fijan a su base dentro de la vista con `fijar_base()`.
+
+Sin réplica configurada el router no hace nada y el middleware se descarta
+al arrancar.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA = "replica"
+COOKIE = "tienda_primaria"
+METODOS_LECTURA = ("GET", "HEAD")
+
+# modelos de la tienda que nunca se leen de la réplica (cola y numeración)
+SIEMPRE_PRINCIPAL = {"tienda.tarea", "tienda.contadorpedidos"}
+
+
+def activa():
+    return getattr(settings, "TIENDA_REPLICA", False)
+
+
+class _Estado:
+    """Lo que el router necesita saber del request en curso."""
+    __slots__ = ("lectura", "escribio", "fijada")
+
+    def __init__(self, fijada=False):
+        self.lectura = False    # vista @solo_lectura en GET/HEAD
+        self.escribio = False   # ya hubo una escritura en este request
+        self.fijada = fijada    # el cliente escribió hace poco (cookie)
+
+
+# un ContextVar sirve igual en hilos y en vistas async (sync_to_async lo copia)
+_estado = ContextVar("tienda_replica", default=None)
+
+
+# --------- ROUTER ----------
+def _de_la_tienda(model):
+    return model._meta.app_label == "tienda" and model._meta.label_lower not in SIEMPRE_PRINCIPAL
+
+
+class RouterReplica:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or not estado.lectura or estado.escribio or estado.fijada:
+            return None
+        if not activa() or not _de_la_tienda(model):
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        if not _de_la_tienda(model):
+            return None
+        estado = _estado.get()
+        if estado is not None:
+            estado.escribio = True
+        # también para instancias leídas de la réplica: se guardan en la principal
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # réplica y principal tienen los mismos datos: un producto leído de la
+        # réplica puede asignarse a una fila que se guarda en la principal
+        bases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+
+# --------- VISTAS ----------
+@contextmanager
+def _lectura(request):
+    estado = _estado.get()
+    token = None
+    if estado is None:   # sin ReplicaMiddleware (p. ej. la vista llamada a mano)
+        estado = _Estado()
+        token = _estado.set(estado)
+    previa = estado.lectura
+    estado.lectura = request.method in METODOS_LECTURA
+    try:
+        yield
+    finally:
+        estado.lectura = previa
+        if token is not None:
+            _estado.reset(token)
+
+
+def solo_lectura(vista):
+    """Permite que las lecturas de la vista (en GET/HEAD) vayan a la réplica. Sync o async."""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            with _lectura(request):
+                return await vista(request, *args, **kwargs)
+        return envoltura
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        with _lectura(request):
+            return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def fijar_base(qs):
+    """
+    `qs` atado a la base que le toca ahora (réplica o principal), para
+    querysets que se recorren fuera de la vista, como las exportaciones en
+    streaming: cuando el servidor pide las filas el estado ya se restauró.
+    Las consultas de prefetch siguen a las instancias, que vienen de esa base.
+    """
+    return qs.using(qs.db)
+
+
+# --------- MIDDLEWARE ----------
+class ReplicaMiddleware:
+    """Estado por request para el router y cookie de "leer de la principal" tras escribir."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not activa():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.fijar = getattr(settings, "TIENDA_REPLICA_FIJAR", 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        estado = _Estado(fijada=COOKIE in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._terminar(estado, respuesta)
+
+    async def __acall__(self, request):
+        estado = _Estado(fijada=COOKIE in request.COOKIES)
+        token = _estado.set(estado)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._terminar(estado, respuesta)
+
+    def _terminar(self, estado, respuesta):
+        if estado.escribio:
+            respuesta.set_cookie(COOKIE, "1", max_age=self.fijar, httponly=True, samesite="Lax")
+        return respuesta
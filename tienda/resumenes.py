@@ -0,0 +1,228 @@
+"""
+Resúmenes de ventas precalculados (VentaDiaria, VentaProducto, VentaCupon).
+
+Cada pedido aporta una "huella" (día, cupón, total y unidades/ingresos por
+producto). Dentro de la transacción que crea o modifica el pedido solo se
+insertan filas propias de MovimientoVenta (un INSERT en bloque): la fila
+del día la comparten todos los checkouts y sumarla ahí dejaría a los
+compradores en fila detrás de su bloqueo. El worker consolida los
+movimientos con un INSERT ... ON CONFLICT DO UPDATE por tabla (tarea
+"resumenes.consolidar", a lo sumo CONSOLIDAR_DEMORA después). Así el panel
+lee unas pocas filas sin importar cuántos pedidos haya en la historia, con
+ese atraso.
+
+Los pedidos CANCELADOS no aportan: pasar a CANCELADO resta la huella y
+salir de CANCELADO la vuelve a sumar. `reconstruir()` recalcula todo desde
+cero (manage.py reconstruir_resumenes).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import tareas
+from .models import DetallePedido, MovimientoVenta, Pedido, VentaCupon, VentaDiaria, VentaProducto
+
+CANCELADO = "CANCELADO"
+CONSOLIDAR_DEMORA = timedelta(seconds=30)
+
+
+def huella(pedido, detalles=None):
+    """Lo que `pedido` aporta a los resúmenes, o None si no suma."""
+    if pedido.estado == CANCELADO:
+        return None
+    detalles = pedido.detalles.all() if detalles is None else detalles
+    return {
+        "dia": timezone.localdate(pedido.creado),
+        "descuento": pedido.descuento_id,
+        "total": pedido.total,
+        "lineas": {d.producto_id: (d.cantidad, d.precio_unitario * d.cantidad) for d in detalles},
+    }
+
+
+def huella_guardada(pk):
+    """Huella del pedido tal como está en la base, bloqueando su fila hasta el commit."""
+    pedido = Pedido.objects.select_for_update().get(pk=pk)
+    return huella(pedido)
+
+
+def _sumar(modelo, claves, filas, lote=150):
+    """Suma `filas` (dicts columna → valor) sobre la tabla de `modelo`; crea las que falten."""
+    if not filas:
+        return
+    qn = connection.ops.quote_name
+    tabla = qn(modelo._meta.db_table)
+    columnas = list(filas[0])
+    acumuladas = [c for c in columnas if c not in claves]
+    fila_sql = "(" + ", ".join(["%s"] * len(columnas)) + ")"
+    conflicto = ", ".join(qn(c) for c in claves)
+    asignaciones = ", ".join(f"{qn(c)} = {tabla}.{qn(c)} + excluded.{qn(c)}" for c in acumuladas)
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(filas), lote):
+            parte = filas[i:i + lote]
+            cursor.execute(
+                f"INSERT INTO {tabla} ({', '.join(qn(c) for c in columnas)}) "
+                f"VALUES {', '.join([fila_sql] * len(parte))} "
+                f"ON CONFLICT ({conflicto}) DO UPDATE SET {asignaciones}",
+                [v for fila in parte for v in fila.values()],
+            )
+
+
+def registrar(h, signo=1):
+    """Anota la huella `h` para sumarla (signo=1) o restarla (signo=-1) de los resúmenes."""
+    if h is None:
+        return
+    unidades = sum(cantidad for cantidad, _ in h["lineas"].values())
+    movimientos = [MovimientoVenta(
+        dia=h["dia"], descuento_id=h["descuento"],
+        pedidos=signo, unidades=signo * unidades, ingresos=signo * h["total"],
+    )]
+    movimientos += [
+        MovimientoVenta(dia=h["dia"], producto_id=pid, pedidos=signo, unidades=signo * cantidad, ingresos=signo * ingresos)
+        for pid, (cantidad, ingresos) in sorted(h["lineas"].items())
+    ]
+    MovimientoVenta.objects.bulk_create(movimientos)
+    # mientras haya una pendiente no se agrega otra
+    tareas.encolar("resumenes.consolidar", unica=True, ejecutar_desde=timezone.now() + CONSOLIDAR_DEMORA)
+
+
+def _cero():
+    return {"pedidos": 0, "unidades": 0, "ingresos": Decimal("0")}
+
+
+def _acumular(grupos, clave, mov, *campos):
+    fila = grupos[clave]
+    for campo in campos:
+        fila[campo] += getattr(mov, campo)
+
+
+def consolidar(lote=1000):
+    """
+    Suma los movimientos pendientes a VentaDiaria, VentaProducto y VentaCupon
+    y los borra, de a `lote` por transacción. Las filas se toman con
+    SKIP LOCKED (donde existe): dos workers nunca suman el mismo movimiento.
+    Devuelve cuántos movimientos consolidó.
+    """
+    hechos = 0
+    while True:
+        with transaction.atomic():
+            movimientos = list(
+                MovimientoVenta.objects.select_for_update(skip_locked=True).order_by("id")[:lote]
+            )
+            if not movimientos:
+                return hechos
+
+            dias, productos, cupones = defaultdict(_cero), defaultdict(_cero), defaultdict(_cero)
+            for mov in movimientos:
+                if mov.producto_id is None:
+                    _acumular(dias, mov.dia, mov, "pedidos", "unidades", "ingresos")
+                    if mov.descuento_id:
+                        _acumular(cupones, mov.descuento_id, mov, "pedidos", "ingresos")
+                else:
+                    _acumular(productos, (mov.dia, mov.producto_id), mov, "pedidos", "unidades", "ingresos")
+
+            fecha = connection.ops.adapt_datefield_value
+            # un pedido creado y cancelado antes de consolidar no deja filas en cero
+            _sumar(VentaDiaria, ["dia"], [
+                {"dia": fecha(dia), **v} for dia, v in sorted(dias.items()) if any(v.values())
+            ])
+            _sumar(VentaProducto, ["dia", "producto_id"], [
+                {"dia": fecha(dia), "producto_id": pid, **v}
+                for (dia, pid), v in sorted(productos.items()) if any(v.values())
+            ])
+            _sumar(VentaCupon, ["descuento_id"], [
+                {"descuento_id": did, "pedidos": v["pedidos"], "ingresos": v["ingresos"]}
+                for did, v in sorted(cupones.items()) if v["pedidos"] or v["ingresos"]
+            ])
+            MovimientoVenta.objects.filter(id__in=[m.id for m in movimientos]).delete()
+        hechos += len(movimientos)
+
+
+def actualizar_pedido(antes, pedido):
+    """Tras editar `pedido` (estado, cupón, líneas), reemplaza su huella `antes` por la actual."""
+    despues = huella(pedido)
+    if antes != despues:
+        registrar(antes, -1)
+        registrar(despues, 1)
+
+
+# --------- LECTURA (panel) ----------
+def tablero(dias=30, top=5):
+    """
+    Datos del panel: solo lee los resúmenes, nunca DetallePedido (los
+    movimientos todavía sin consolidar aparecen en la próxima pasada del worker).
+    """
+    hoy = timezone.localdate()
+    desde = hoy - timedelta(days=dias - 1)
+
+    por_dia = list(VentaDiaria.objects.filter(dia__gte=desde).order_by("dia"))
+    historico = VentaDiaria.objects.aggregate(pedidos=Sum("pedidos"), ingresos=Sum("ingresos"))
+    productos = (
+        VentaProducto.objects.filter(dia__gte=desde)
+        .values("producto_id", "producto__nombre")
+        .annotate(unidades=Sum("unidades"), ingresos=Sum("ingresos"))
+        .order_by("-ingresos")[:top]
+    )
+    cupones = VentaCupon.objects.select_related("descuento").order_by("-pedidos")[:top]
+
+    return {
+        "dias": dias,
+        "por_dia": por_dia,
+        "hoy": next((d for d in por_dia if d.dia == hoy), None),
+        "periodo": {
+            "pedidos": sum(d.pedidos for d in por_dia),
+            "unidades": sum(d.unidades for d in por_dia),
+            "ingresos": sum((d.ingresos for d in por_dia), 0),
+        },
+        "historico": {k: v or 0 for k, v in historico.items()},
+        "top_productos": list(productos),
+        "cupones": list(cupones),
+    }
+
+
+# --------- RECONSTRUCCIÓN ----------
+def reconstruir(lote=1000):
+    """Vacía los resúmenes y los recalcula desde Pedido/DetallePedido."""
+    validos = Pedido.objects.exclude(estado=CANCELADO)
+    lineas = DetallePedido.objects.exclude(pedido__estado=CANCELADO)
+    ingreso_linea = Sum(F("precio_unitario") * F("cantidad"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    with transaction.atomic():
+        MovimientoVenta.objects.all().delete()   # ya están contados en los pedidos
+        VentaDiaria.objects.all().delete()
+        VentaProducto.objects.all().delete()
+        VentaCupon.objects.all().delete()
+
+        unidades = dict(
+            lineas.annotate(dia=TruncDate("pedido__creado")).values("dia")
+            .annotate(u=Sum("cantidad")).order_by().values_list("dia", "u")
+        )
+        VentaDiaria.objects.bulk_create(
+            (VentaDiaria(dia=r["dia"], pedidos=r["n"], unidades=unidades.get(r["dia"], 0), ingresos=r["t"])
+             for r in validos.annotate(dia=TruncDate("creado")).values("dia")
+             .annotate(n=Count("id"), t=Sum("total")).order_by().iterator()),
+            batch_size=lote,
+        )
+        VentaProducto.objects.bulk_create(
+            (VentaProducto(dia=r["dia"], producto_id=r["producto"], pedidos=r["n"], unidades=r["u"], ingresos=r["t"])
+             for r in lineas.annotate(dia=TruncDate("pedido__creado")).values("dia", "producto")
+             .annotate(n=Count("id"), u=Sum("cantidad"), t=ingreso_linea).order_by().iterator()),
+            batch_size=lote,
+        )
+        VentaCupon.objects.bulk_create(
+            (VentaCupon(descuento_id=r["descuento"], pedidos=r["n"], ingresos=r["t"])
+             for r in validos.exclude(descuento=None).values("descuento")
+             .annotate(n=Count("id"), t=Sum("total")).order_by().iterator()),
+            batch_size=lote,
+        )
+
+    return {
+        "dias": VentaDiaria.objects.count(),
+        "productos_dia": VentaProducto.objects.count(),
+        "cupones": VentaCupon.objects.count(),
+    }
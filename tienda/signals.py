@@ -0,0 +1,128 @@
+# tienda/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from . import busqueda, contadores, imagenes, resumenes, tareas, versiones
+from .models import Categoria, Pedido, Producto
+
+# Escrituras masivas de productos (bulk_create / update) que no disparan
+# post_save. Quien las hace envía: sender=Producto, ids (lista o queryset de
+# ids, que los receptores usan como subconsulta), using=alias y, si los
+# conoce, campos=[...] con lo que cambió (None = cualquier campo).
+productos_actualizados_en_bloque = Signal()
+
+CAMPOS_INDEXADOS = {"nombre", "resumen", "descripcion"}
+CAMPOS_CONTADOS = {"precio", "stock", "disponible", "categoria"}
+
+
+# --------- ÍNDICE DE BÚSQUEDA ----------
+@receiver(post_save, sender=Producto)
+def producto_indexar(sender, instance, using, **kwargs):
+    busqueda.indexar([instance], using=using)
+
+
+@receiver(post_delete, sender=Producto)
+def producto_desindexar(sender, instance, using, **kwargs):
+    busqueda.desindexar([instance.id], using=using)
+
+
+@receiver(productos_actualizados_en_bloque)
+def productos_reindexar(sender, ids, using="default", campos=None, **kwargs):
+    if campos is None or CAMPOS_INDEXADOS & set(campos):
+        busqueda.reindexar(ids, using=using)
+
+
+# --------- CACHÉ DE FRAGMENTOS ----------
+# Las tarjetas de producto llevan Producto.actualizado en la clave: cualquier
+# save() (editar, desactivar) ya genera una clave nueva. Las de categorías
+# van por versiones.categorias() (Max(actualizado) y cantidad), que también
+# cambia sola; solo queda recalentar el catálogo.
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def categoria_invalidar(sender, **kwargs):
+    tareas.programar_calentado()
+
+
+@receiver(productos_actualizados_en_bloque)
+def productos_invalidar(sender, **kwargs):
+    # un solo salto de versión por lote, no uno por producto
+    versiones.invalidar(versiones.CATALOGO, versiones.FACETAS, versiones.PAGINAS)
+
+
+# Los conteos de la barra de filtros y las páginas cacheadas para anónimos no
+# tienen marca de tiempo: cualquier cambio de producto o categoría los
+# recalcula. El checkout no avisa (sería un incr de caché por compra); ahí
+# mandan facetas.FACETAS_TTL y TIENDA_CACHE_ANONIMA_TTL.
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def facetas_y_paginas_invalidar(sender, **kwargs):
+    versiones.invalidar(versiones.FACETAS, versiones.PAGINAS)
+
+
+# Los bloques de relacionados de la ficha guardan copias de otros productos
+# (precio, disponible): cualquier edición los vuelve a armar.
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(productos_actualizados_en_bloque)
+def relacionados_invalidar(sender, **kwargs):
+    versiones.invalidar(versiones.RELACIONADOS)
+
+
+# --------- CONTADORES DE CATEGORÍA ----------
+# Ver tienda/contadores.py. Se recuenta la categoría del producto y, si se
+# movió, también la anterior.
+def _toca_contadores(update_fields):
+    return update_fields is None or bool(CAMPOS_CONTADOS & set(update_fields))
+
+
+@receiver(pre_save, sender=Producto)
+def producto_recordar_categoria(sender, instance, using, update_fields=None, **kwargs):
+    instance._categoria_previa = None
+    if instance._state.adding or not _toca_contadores(update_fields):
+        return
+    instance._categoria_previa = (
+        Producto.objects.using(using).filter(pk=instance.pk).values_list("categoria_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Producto)
+def producto_recontar_categorias(sender, instance, using, update_fields=None, **kwargs):
+    if not _toca_contadores(update_fields):
+        return
+    categorias = {instance.categoria_id, getattr(instance, "_categoria_previa", None)} - {None}
+    if categorias:
+        contadores.recontar(categorias, using=using)
+
+
+@receiver(post_delete, sender=Producto)
+def producto_borrado_recontar(sender, instance, using, **kwargs):
+    if instance.categoria_id:
+        contadores.recontar([instance.categoria_id], using=using)
+
+
+@receiver(productos_actualizados_en_bloque)
+def productos_recontar_categorias(sender, ids, using="default", campos=None, **kwargs):
+    if campos is None:
+        # sin saber qué cambió (p. ej. la importación) pudieron moverse de categoría
+        contadores.recontar(using=using)
+    elif CAMPOS_CONTADOS & set(campos):
+        contadores.recontar_de_productos(ids, using=using)
+
+
+# --------- DERIVADOS DE IMÁGENES ----------
+# Se generan en el worker (run_worker), fuera del request que sube la imagen.
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Categoria)
+def generar_derivados_imagen(sender, instance, raw=False, **kwargs):
+    if raw or not imagenes.desactualizados(instance):
+        return
+    tareas.encolar("imagenes.derivados", modelo=sender._meta.label_lower, pk=instance.pk)
+
+
+# --------- RESÚMENES DE VENTAS ----------
+# pre_delete: las líneas todavía existen y se puede restar lo que aportaba.
+@receiver(pre_delete, sender=Pedido)
+def pedido_restar_de_resumenes(sender, instance, **kwargs):
+    resumenes.registrar(resumenes.huella(instance), -1)
@@ -0,0 +1,25 @@
+// Páginas servidas desde la caché de anónimos: los formularios llegan sin
+// token CSRF ({% csrf_input %}). Se pide a /csrf/ recién al enviar, así
+// navegar el catálogo no cuesta ninguna petición extra.
+(function () {
+  var url = document.currentScript.dataset.csrfUrl;
+  var token = null;
+
+  document.addEventListener("submit", function (ev) {
+    var form = ev.target;
+    var campo = form.querySelector("input[data-csrf]");
+    if (!campo || campo.value) return;
+    ev.preventDefault();
+
+    var pedir = token
+      ? Promise.resolve(token)
+      : fetch(url, { credentials: "same-origin", cache: "no-store" })
+          .then(function (r) { return r.json(); })
+          .then(function (datos) { token = datos.token; return token; });
+
+    pedir.then(function (t) {
+      campo.value = t;
+      form.submit();
+    });
+  });
+})();
@@ -0,0 +1,253 @@
+"""
+Cola de tareas en la propia base de datos (sin broker externo).
+
+`encolar("nombre", **argumentos)` inserta una fila Tarea dentro de la
+transacción en curso: si la transacción se deshace, la tarea tampoco existe,
+y el worker no la ve hasta el commit. `manage.py run_worker` toma las tareas
+con un UPDATE condicional (PENDIENTE → EN_CURSO), así que dos workers nunca
+ejecutan la misma, y reintenta las que fallan con espera exponencial.
+
+Con settings.TIENDA_TAREAS_SINCRONAS = True (tests, desarrollo sin worker)
+encolar() ejecuta la tarea en el momento.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import close_old_connections
+from django.db.models import F, Prefetch
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import imagenes, relacionados
+from .models import DetallePedido, Pedido, Tarea
+
+logger = logging.getLogger(__name__)
+
+TAREAS = {}
+
+ESPERA_BASE = 30               # segundos antes del primer reintento; se duplica en cada intento
+ESPERA_MAX = 60 * 60
+TIEMPO_MAX_EN_CURSO = timedelta(minutes=15)   # pasado esto se asume que el worker murió
+CONSERVAR_TERMINADAS = timedelta(days=7)
+CALENTAR_DEMORA = timedelta(seconds=30)     # junta en un solo calentado una ráfaga de cambios
+
+# cachés que viven dentro de cada proceso (o no guardan nada)
+CACHES_LOCALES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def tarea(nombre):
+    """Registra la función decorada bajo `nombre`."""
+    def registrar(fn):
+        TAREAS[nombre] = fn
+        return fn
+    return registrar
+
+
+# --------- ENCOLAR ----------
+def encolar(nombre, unica=False, ejecutar_desde=None, **argumentos):
+    """
+    Deja la tarea `nombre` pendiente con `argumentos` (deben ser serializables
+    a JSON). Con `unica=True` no se duplica si ya hay una igual esperando.
+    """
+    if nombre not in TAREAS:
+        raise KeyError(f"Tarea desconocida: {nombre}")
+    if getattr(settings, "TIENDA_TAREAS_SINCRONAS", False):
+        TAREAS[nombre](**argumentos)
+        return None
+    if unica:
+        existente = Tarea.objects.filter(nombre=nombre, argumentos=argumentos, estado=Tarea.PENDIENTE).first()
+        if existente:
+            return existente
+    return Tarea.objects.create(
+        nombre=nombre, argumentos=argumentos, ejecutar_desde=ejecutar_desde or timezone.now()
+    )
+
+
+# --------- WORKER ----------
+def recuperar_colgadas():
+    """Devuelve a la cola las tareas EN_CURSO de un worker que murió a mitad de camino."""
+    limite = timezone.now() - TIEMPO_MAX_EN_CURSO
+    return Tarea.objects.filter(estado=Tarea.EN_CURSO, tomada__lt=limite).update(
+        estado=Tarea.PENDIENTE, tomada=None
+    )
+
+
+def purgar_terminadas():
+    limite = timezone.now() - CONSERVAR_TERMINADAS
+    return Tarea.objects.filter(estado=Tarea.HECHA, terminado__lt=limite).delete()[0]
+
+
+def tomar(lote=10):
+    """
+    Reserva la próxima tarea pendiente. La reserva es un UPDATE condicional
+    sobre el estado: si otro worker se la llevó primero, actualiza 0 filas y
+    se prueba con la siguiente candidata.
+    """
+    ahora = timezone.now()
+    candidatas = list(
+        Tarea.objects.filter(estado=Tarea.PENDIENTE, ejecutar_desde__lte=ahora)
+        .order_by("ejecutar_desde", "id").values_list("id", flat=True)[:lote]
+    )
+    for pk in candidatas:
+        tomada = Tarea.objects.filter(pk=pk, estado=Tarea.PENDIENTE).update(
+            estado=Tarea.EN_CURSO, tomada=ahora, intentos=F("intentos") + 1
+        )
+        if tomada:
+            return Tarea.objects.get(pk=pk)
+    return None
+
+
+def espera_reintento(intentos):
+    """Segundos hasta el próximo intento: 30, 60, 120… con ±20 % de dispersión."""
+    espera = min(ESPERA_BASE * 2 ** max(intentos - 1, 0), ESPERA_MAX)
+    return espera * random.uniform(0.8, 1.2)
+
+
+def ejecutar(t):
+    """Corre una tarea ya tomada y registra el resultado. Devuelve True si terminó bien."""
+    try:
+        fn = TAREAS.get(t.nombre)
+        if fn is None:
+            raise KeyError(f"Tarea desconocida: {t.nombre}")
+        fn(**t.argumentos)
+    except Exception:
+        logger.exception("Falló la tarea %s #%s (intento %s)", t.nombre, t.id, t.intentos)
+        ahora = timezone.now()
+        if t.intentos >= t.max_intentos:
+            campos = {"estado": Tarea.FALLIDA, "terminado": ahora}
+        else:
+            campos = {
+                "estado": Tarea.PENDIENTE, "tomada": None,
+                "ejecutar_desde": ahora + timedelta(seconds=espera_reintento(t.intentos)),
+            }
+        Tarea.objects.filter(pk=t.pk).update(ultimo_error=traceback.format_exc()[-4000:], **campos)
+        return False
+
+    Tarea.objects.filter(pk=t.pk).update(estado=Tarea.HECHA, terminado=timezone.now(), ultimo_error="")
+    return True
+
+
+def procesar_pendientes(limite=None):
+    """Ejecuta tareas hasta vaciar la cola (o hasta `limite`). Devuelve cuántas corrió."""
+    hechas = 0
+    while limite is None or hechas < limite:
+        t = tomar()
+        if t is None:
+            break
+        ejecutar(t)
+        hechas += 1
+    return hechas
+
+
+def trabajar(parar, espera=1.0):
+    """
+    Bucle de un worker: toma y ejecuta tareas hasta que se active `parar`
+    (un threading.Event o multiprocessing.Event). Sin trabajo, duerme `espera`
+    segundos entre sondeos.
+    """
+    ultima_purga = 0.0
+    while not parar.is_set():
+        close_old_connections()
+        t = tomar()
+        if t is not None:
+            ejecutar(t)
+            continue
+        recuperar_colgadas()
+        if time.monotonic() - ultima_purga > 3600:
+            purgar_terminadas()
+            ultima_purga = time.monotonic()
+        parar.wait(espera)
+
+
+# --------- TAREAS ----------
+@tarea("imagenes.derivados")
+def derivados_imagen(modelo, pk):
+    obj = apps.get_model(modelo).objects.filter(pk=pk).first()
+    if obj is not None:   # pudo borrarse mientras esperaba
+        imagenes.actualizar_derivados(obj)
+
+
+@tarea("pedidos.correo_confirmacion")
+def correo_confirmacion(pedido_id):
+    pedido = (
+        Pedido.objects.select_related("usuario", "descuento")
+        .prefetch_related(Prefetch("detalles", DetallePedido.objects.select_related("producto")))
+        .filter(pk=pedido_id).first()
+    )
+    if pedido is None or not pedido.usuario.email:
+        return
+    send_mail(
+        f"Tu pedido #{pedido.numero_usuario} en Papelería Ganbaru",
+        render_to_string("tienda/correos/pedido_confirmado.txt", {"pedido": pedido}),
+        None,
+        [pedido.usuario.email],
+    )
+
+
+def cache_compartida():
+    """
+    True si lo que el worker deja en la caché lo ven los procesos web. Con
+    LocMem cada proceso tiene la suya y calentar desde el worker no sirve
+    (salvo con TIENDA_TAREAS_SINCRONAS, que calienta en el propio proceso).
+    """
+    if getattr(settings, "TIENDA_TAREAS_SINCRONAS", False):
+        return True
+    return settings.CACHES["default"]["BACKEND"] not in CACHES_LOCALES
+
+
+def programar_calentado():
+    """
+    Encola un calentado del catálogo dentro de CALENTAR_DEMORA; mientras
+    haya uno pendiente no se agrega otro. Sin caché compartida no encola nada.
+    """
+    if not cache_compartida():
+        return None
+    return encolar("catalogo.calentar", unica=True, ejecutar_desde=timezone.now() + CALENTAR_DEMORA)
+
+
+@tarea("catalogo.calentar")
+def calentar_catalogo():
+    """
+    Renderiza la portada y la primera página de cada categoría para dejar
+    las pills y tarjetas en la caché de fragmentos (tras invalidar versiones).
+    """
+    if not cache_compartida():
+        logger.warning("catalogo.calentar: la caché por defecto no es compartida; no se calienta nada")
+        return
+    # import local: views importa (indirectamente) este módulo
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    from .models import Categoria
+    from .views import inicio
+
+    fabrica = RequestFactory()
+    for slug in ["", *Categoria.objects.values_list("slug", flat=True)]:
+        request = fabrica.get("/", {"cat": slug} if slug else {})
+        request.user = AnonymousUser()
+        inicio(request)
+
+
+@tarea("catalogo.relacionados")
+def recalcular_relacionados(dias=None):
+    """Recalcula la tabla de "comprados juntos" (ver tienda/relacionados.py)."""
+    desde = timezone.now() - timedelta(days=dias) if dias else None
+    relacionados.recalcular(desde=desde)
+
+
+@tarea("resumenes.consolidar")
+def consolidar_resumenes():
+    """Suma a los resúmenes de ventas los movimientos que dejaron los checkouts."""
+    # import local: resumenes encola esta tarea
+    from .resumenes import consolidar
+
+    consolidar()
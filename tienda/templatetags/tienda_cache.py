@@ -0,0 +1,18 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def csrf_input(context):
+    """
+    Igual que {% csrf_token %}, salvo en páginas que van a la caché de
+    anónimos (ver tienda/cache_paginas.py): ahí deja el campo vacío y
+    static/tienda/js/csrf.js lo completa al enviar el formulario.
+    """
+    request = context.get("request")
+    if getattr(request, "cache_anonima", False):
+        return format_html('<input type="hidden" name="csrfmiddlewaretoken" value="" data-csrf>')
+    return format_html('<input type="hidden" name="csrfmiddlewaretoken" value="{}">', context.get("csrf_token"))
+
@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def conteo(por_categoria, slug):
+    """Uso: {{ facetas.por_categoria|conteo:c.slug }} (0 si la categoría no tiene productos)."""
+    return por_categoria.get(slug, 0)
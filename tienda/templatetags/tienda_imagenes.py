@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from tienda import imagenes
+
+register = template.Library()
+
+
+@register.simple_tag
+def imagen_responsive(obj, sizes, clase="", alt=None, style="", carga="lazy"):
+    """
+    <picture> con <source> AVIF/WebP (srcset por ancho) y el original como
+    respaldo. Carga diferida por defecto; la imagen principal de una página
+    conviene pasarla con carga="eager".
+    Uso: {% imagen_responsive p "(max-width: 640px) 90vw, 280px" %}
+    """
+    alt = obj.nombre if alt is None else alt
+    fuentes = format_html_join(
+        "", '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, srcset, sizes) for fmt in ("avif", "webp") if (srcset := imagenes.srcset(obj, fmt))),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}" class="{}" style="{}" loading="{}" decoding="async"></picture>',
+        fuentes, obj.imagen.url, alt, clase, style, carga,
+    )
+
+
+@register.simple_tag
+def miniatura_url(obj, ancho=160):
+    return imagenes.url_miniatura(obj, ancho)
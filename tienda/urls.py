@@ -1,11 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from . import views
-from .views import producto_detalle
+from . import api, views, views_async
+
+# inicio, ficha y carrito en versión async cuando se sirve con ASGI
+lectura = views_async if settings.TIENDA_ASGI else views
 
 app_name = 'tienda'
 
 urlpatterns = [
-    path('', views.inicio, name='inicio'),
+    path('', lectura.inicio, name='inicio'),
+    path('csrf/', views.csrf, name='csrf'),
 
     # Auth
     path('registro/', views.registro, name='registro'),
@@ -14,7 +18,7 @@ urlpatterns = [
     path('perfil/', views.perfil, name='perfil'),
 
     # Carrito
-    path('carrito/', views.carrito_ver, name='carrito_ver'),
+    path('carrito/', lectura.carrito_ver, name='carrito_ver'),
     path('carrito/agregar/<int:producto_id>/', views.carrito_agregar, name='carrito_agregar'),
     path('carrito/set/<int:producto_id>/', views.carrito_set, name='carrito_set'),
     path('carrito/eliminar/<int:producto_id>/', views.carrito_eliminar, name='carrito_eliminar'),
@@ -25,20 +29,32 @@ urlpatterns = [
     
     # ===== PANEL (solo staff) =====
     path('panel/', views.panel_home, name='panel_home'),
+    path("panel/metrics/", views.panel_metricas, name="panel_metricas"),
+    path("metrics", views.metricas_prometheus, name="metricas_prometheus"),
 
     # Productos (CRUD)
     path("panel/productos/", views.panel_productos, name="panel_productos"),
     path("panel/productos/nuevo/", views.panel_producto_nuevo, name="panel_producto_nuevo"),
+    path("panel/productos/importar/", views.panel_productos_importar, name="panel_productos_importar"),
+    path("panel/productos/masivo/", views.panel_productos_masivo, name="panel_productos_masivo"),
+    path("panel/productos/disponibilidad/", views.panel_productos_disponibilidad, name="panel_productos_disponibilidad"),
     path("panel/productos/<int:pk>/editar/", views.panel_producto_editar, name="panel_producto_editar"),
     path("panel/productos/<int:pk>/eliminar/", views.panel_producto_eliminar, name="panel_producto_eliminar"),
     path("panel/productos/<int:pk>/desactivar/", views.panel_producto_desactivar, name="panel_producto_desactivar"),
+    path("panel/productos/exportar.<str:formato>", views.panel_exportar_productos, name="panel_exportar_productos"),
 
     # Pedidos
     path("panel/pedidos/", views.panel_pedidos, name="panel_pedidos"),
     path("panel/pedidos/<int:pk>/", views.panel_pedido_detalle, name="panel_pedido_detalle"),
+    path("panel/pedidos/exportar.<str:formato>", views.panel_exportar_pedidos, name="panel_exportar_pedidos"),
 
     # Ficha de producto
-    path('producto/<int:pk>/', producto_detalle, name='producto_detalle'),
+    path('producto/<int:pk>/', lectura.producto_detalle, name='producto_detalle'),
+
+    # API JSON (solo lectura)
+    path("api/productos/", api.productos, name="api_productos"),
+    path("api/productos/<int:pk>/", api.producto, name="api_producto"),
+    path("api/categorias/", api.categorias, name="api_categorias"),
 
     # PANEL CATEGORÍAS
     path("panel/categorias/", views.panel_categorias, name="panel_categorias"),
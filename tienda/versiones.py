@@ -0,0 +1,100 @@
+"""
+Contadores de versión en la caché para invalidar fragmentos de plantilla
+sin vaciar toda la caché: cada fragmento incluye la versión en su clave y
+basta con subir el contador para que la próxima lectura lo regenere.
+
+Con la caché en memoria local cada proceso tiene sus propios contadores y
+una invalidación no llega a los demás workers. Por eso lo que vive mucho y
+cambia desde cualquier proceso (categorías) se versiona con los datos
+(`categorias()`), como las tarjetas con Producto.actualizado.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+PREFIJO = "tienda:v:"
+
+CATALOGO = "catalogo"       # tarjetas de producto (además van por Producto.actualizado)
+FACETAS = "facetas"         # conteos de la barra de filtros (ver facetas.py)
+PAGINAS = "paginas"         # páginas completas para anónimos (ver cache_paginas.py)
+RELACIONADOS = "relacionados"   # bloques de relacionados de la ficha (ver relacionados.py)
+
+
+def _clave(nombre):
+    return f"{PREFIJO}{nombre}"
+
+
+def _inicial():
+    # si la clave se perdió (expulsión/reinicio) no conviene volver a 1:
+    # podría coincidir con fragmentos viejos que siguen en la caché
+    return int(time.time() * 1000)
+
+
+def versiones(*nombres):
+    """Dict {nombre: versión} leyendo todos los contadores en una sola ida a la caché."""
+    claves = {_clave(n): n for n in nombres}
+    encontrados = cache.get_many(list(claves))
+    res = {}
+    for clave, nombre in claves.items():
+        v = encontrados.get(clave)
+        if v is None:
+            v = _inicial()
+            if not cache.add(clave, v, timeout=None):
+                v = cache.get(clave, v)
+        res[nombre] = v
+    return res
+
+
+async def aversiones(*nombres):
+    """Igual que versiones(), con la API asíncrona de la caché (vistas ASGI)."""
+    claves = {_clave(n): n for n in nombres}
+    encontrados = await cache.aget_many(list(claves))
+    res = {}
+    for clave, nombre in claves.items():
+        v = encontrados.get(clave)
+        if v is None:
+            v = _inicial()
+            if not await cache.aadd(clave, v, timeout=None):
+                v = await cache.aget(clave, v)
+        res[nombre] = v
+    return res
+
+
+def version(nombre):
+    return versiones(nombre)[nombre]
+
+
+async def aversion(nombre):
+    return (await aversiones(nombre))[nombre]
+
+
+def invalidar(*nombres):
+    for nombre in nombres:
+        try:
+            cache.incr(_clave(nombre))
+        except ValueError:
+            cache.set(_clave(nombre), _inicial(), timeout=None)
+
+
+# --------- VERSIONES SACADAS DE LOS DATOS ----------
+def _marca(estado):
+    ultima = estado["ultima"]
+    return f"{estado['n']}:{ultima.timestamp() if ultima else 0}"
+
+
+def categorias():
+    """
+    Versión de las categorías (pills, <select>, API): Max(actualizado) y
+    cantidad, así que cambia al editar, borrar o recontar una categoría y
+    es la misma en todos los procesos.
+    """
+    from .models import Categoria
+
+    return _marca(Categoria.objects.aggregate(ultima=Max("actualizado"), n=Count("id")))
+
+
+async def acategorias():
+    from .models import Categoria
+
+    return _marca(await Categoria.objects.aaggregate(ultima=Max("actualizado"), n=Count("id")))
@@ -1,83 +1,74 @@
 # tienda/views.py
 import secrets
-from decimal import Decimal, InvalidOperation
 
 from django.contrib import messages
-from django.http import Http404
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Prefetch
 from django.db.models.deletion import ProtectedError
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.db.models import Max
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 
+from . import ajustes, busqueda, exportar, facetas, metricas, relacionados, resumenes, versiones
+from .cache_paginas import cache_anonima
 from .cart import Cart
-from .forms import RegistroForm, ProductoForm, PedidoEstadoForm, CategoriaForm, DescuentoForm
+from .filtros import buscar_catalogo, filtrar_catalogo, filtrar_pedidos
+from .paginacion import paginar_keyset
+from .replicas import fijar_base, solo_lectura
+from .pedidos import StockInsuficiente, crear_pedido
+from .forms import RegistroForm, ProductoForm, PedidoEstadoForm, CategoriaForm, DescuentoForm, ImportarProductosForm
+from .forms import AjustePreciosForm, AjusteStockForm
+from .importar import ErrorDeArchivo, importar_productos, leer_filas
 from .models import Producto, Categoria, Pedido, DetallePedido, Descuento
 
 
 # --------- HOME / CATÁLOGO ----------
-def inicio(request):
-    qs = Producto.objects.all()
-    categorias = Categoria.objects.all()
+PRODUCTOS_POR_PAGINA = 24
+PANEL_POR_PAGINA = 50
+FRAGMENTOS_TTL = 60 * 60  # segundos que viven las tarjetas / pills en la caché
 
-    # GET params
-    q        = request.GET.get("q", "").strip()
-    cat_slug = request.GET.get("cat", "").strip()
-    solo_ok  = request.GET.get("ok") == "1"
-    pmin     = request.GET.get("pmin", "").strip()
-    pmax     = request.GET.get("pmax", "").strip()
-    ordenar  = request.GET.get("ord", "recientes")
-
-    if q:
-        qs = qs.filter(Q(nombre__icontains=q) | Q(descripcion__icontains=q))
 
-    # ⚠️ IMPORTANTE: si tu FK en Producto se llama 'Categoria' (con C mayúscula),
-    # el filtro correcto es 'Categoria__slug', no 'categoria__slug'.
-    # Si tu FK se llama 'categoria' (minúscula), deja 'categoria__slug'.
-    if cat_slug:
-        try:
-            qs = qs.filter(categoria__slug=cat_slug)  # usa Categoria__slug si tu campo es 'Categoria'
-        except Exception:
-            qs = qs.filter(Categoria__slug=cat_slug)
+@cache_anonima
+@solo_lectura
+def inicio(request):
+    # búsqueda de texto completo, categoría, disponibles y precio (ver filtros.py)
+    qs, f = filtrar_catalogo(request.GET)
 
-    if solo_ok:
-        qs = qs.filter(disponible=True)
-
-    def as_decimal(v):
-        try:
-            return Decimal(v.replace(",", ".")) if v else None
-        except (InvalidOperation, AttributeError):
-            return None
-
-    dmin, dmax = as_decimal(pmin), as_decimal(pmax)
-    if dmin is not None:
-        qs = qs.filter(precio__gte=dmin)
-    if dmax is not None:
-        qs = qs.filter(precio__lte=dmax)
-
-    orden_map = {
-        "recientes": "-creado",
-        "precio_asc": "precio",
-        "precio_desc": "-precio",
-        "nombre_asc": "nombre",
-        "nombre_desc": "-nombre",
-    }
-    qs = qs.order_by(orden_map.get(ordenar, "-creado"))
+    # paginación por cursor: (campo de orden, id) → cada página es un rango del índice
+    pagina = paginar_keyset(qs, f["orden"], cursor=request.GET.get("cursor"), por_pagina=PRODUCTOS_POR_PAGINA)
+    cache_v = versiones.versiones(versiones.CATALOGO, versiones.FACETAS)
 
     ctx = {
-        "productos": qs,
-        "categorias": categorias,
-        "cat_seleccionada": cat_slug,
-        "f": {"q": q, "ok": solo_ok, "pmin": pmin, "pmax": pmax, "ord": ordenar},
+        "productos": pagina.objetos,
+        "pagina": pagina,
+        "categorias": Categoria.objects.all(),
+        "cat_seleccionada": f["cat"],
+        "facetas": facetas.calcular(
+            buscar_catalogo(f["q"]), f["cat"], f["ok"], f["dmin"], f["dmax"],
+            q=f["q"], version=cache_v[versiones.FACETAS],
+        ),
+        "cache_ttl": FRAGMENTOS_TTL,
+        "cache_v": cache_v,
+        "categorias_v": versiones.categorias(),
+        "f": f,
     }
     return render(request, "tienda/index.html", ctx)
 
 
+@never_cache
+def csrf(request):
+    """Token CSRF para los formularios de las páginas cacheadas (static/tienda/js/csrf.js)."""
+    return JsonResponse({"token": get_token(request)})
+
+
 # --------- AUTH ----------
 class IniciarSesionView(LoginView):
     template_name = "registration/login.html"
@@ -104,15 +95,18 @@ def registro(request):
     return render(request, "tienda/registro.html", {"form": form})
 
 @login_required
+@solo_lectura
 def perfil(request):
-    pedidos = Pedido.objects.filter(usuario=request.user).prefetch_related("detalles", "detalles__producto")
+    pedidos = Pedido.objects.filter(usuario=request.user).prefetch_related(
+        Prefetch("detalles", queryset=DetallePedido.objects.select_related("producto"))
+    )
     return render(request, "tienda/perfil.html", {"pedidos": pedidos})
 
 
 # --------- CARRITO ----------
 def carrito_ver(request):
     cart = Cart(request)
-    return render(request, "tienda/carrito.html", {"items": list(cart.items()), "total": cart.total()})
+    return render(request, "tienda/carrito.html", {"items": cart.items(), "total": cart.total()})
 
 def carrito_agregar(request, producto_id):
     try:
@@ -156,7 +150,7 @@ def carrito_eliminar(request, producto_id):
 @login_required
 def checkout(request):
     cart = Cart(request)
-    items = list(cart.items())
+    items = cart.items()
     if not items:
         messages.info(request, "Tu carrito está vacío.")
         return redirect("tienda:carrito_ver")
@@ -176,41 +170,11 @@ def checkout(request):
     codigo_desc = request.POST.get("cupon", "").strip()
     cupon = Descuento.objects.filter(codigo=codigo_desc, activo=True).first() if codigo_desc else None
 
-    with transaction.atomic():
-        ids = [it["producto"].id for it in items]
-        productos_bloqueados = Producto.objects.select_for_update().filter(id__in=ids).in_bulk()
-
-        for it in items:
-            p = productos_bloqueados[it["producto"].id]
-            if p.stock < it["cantidad"]:
-                messages.error(request, f"No hay stock suficiente de '{p.nombre}'. Disponible: {p.stock}.")
-                return redirect("tienda:carrito_ver")
-
-        ultimo_num = (
-        Pedido.objects
-            .filter(usuario=request.user)
-            .aggregate(Max("numero_usuario"))["numero_usuario__max"]
-        or 0
-        )
-
-        pedido = Pedido.objects.create(usuario=request.user, descuento=cupon, estado="PENDIENTE",numero_usuario=ultimo_num + 1,)
-
-        for it in items:
-            p = productos_bloqueados[it["producto"].id]
-            p.stock -= it["cantidad"]
-            if p.stock == 0:
-                p.disponible = False
-            p.save()
-
-            DetallePedido.objects.create(
-                pedido=pedido,
-                producto=p,
-                cantidad=it["cantidad"],
-                precio_unitario=it["precio_unitario"],
-            )
-
-        pedido.recomputar_total()
-        pedido.save()
+    try:
+        pedido = crear_pedido(request.user, items, cupon)
+    except StockInsuficiente as e:
+        messages.error(request, str(e))
+        return redirect("tienda:carrito_ver")
 
     cart.clear()
     messages.success(request, f"Pedido #{pedido.id} creado correctamente.")
@@ -227,18 +191,28 @@ def pedido_exito(request, pedido_id):
 # =======================
 
 @staff_member_required
+@solo_lectura
 def panel_home(request):
+    # ventas desde los resúmenes precalculados: el costo no crece con la historia
+    tablero = resumenes.tablero()
     total_prod = Producto.objects.count()
-    total_ped = Pedido.objects.count()
     pendientes = Pedido.objects.filter(estado="PENDIENTE").count()
     return render(request, "tienda/panel/home.html", {
-        "total_prod": total_prod, "total_ped": total_ped, "pendientes": pendientes,
+        "total_prod": total_prod, "total_ped": tablero["historico"]["pedidos"],
+        "pendientes": pendientes, "t": tablero,
     })
 
 @staff_member_required
+@solo_lectura
 def panel_productos(request):
-    productos = Producto.objects.all().order_by("nombre")
-    return render(request, "tienda/panel/productos_list.html", {"productos": productos})
+    q = request.GET.get("q", "").strip()
+    qs = Producto.objects.all()
+    if q:
+        qs = busqueda.buscar(qs, q)
+    pagina = paginar_keyset(qs, "nombre", cursor=request.GET.get("cursor"), por_pagina=PANEL_POR_PAGINA)
+    return render(request, "tienda/panel/productos_list.html", {
+        "productos": pagina.objetos, "pagina": pagina, "q": q,
+    })
 
 @staff_member_required
 def panel_producto_nuevo(request):
@@ -252,6 +226,74 @@ def panel_producto_nuevo(request):
         form = ProductoForm()
     return render(request, "tienda/panel/producto_form.html", {"form": form, "titulo": "Nuevo producto"})
 
+@staff_member_required
+def panel_productos_importar(request):
+    resultado = None
+    if request.method == "POST":
+        form = ImportarProductosForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data["archivo"]
+            try:
+                filas = leer_filas(archivo, archivo.formato)
+            except ErrorDeArchivo as e:
+                form.add_error("archivo", str(e))
+            else:
+                resultado = importar_productos(filas, simular=form.cleaned_data["simular"])
+                if not resultado.simulacion and resultado.validos:
+                    messages.success(
+                        request, f"Importación lista: {resultado.creados} nuevos, {resultado.actualizados} actualizados."
+                    )
+    else:
+        form = ImportarProductosForm()
+    return render(request, "tienda/panel/productos_importar.html", {"form": form, "resultado": resultado})
+
+@staff_member_required
+def panel_productos_masivo(request):
+    """Ajustes en bloque: precio por categoría y stock desde una lista."""
+    accion = request.POST.get("accion") if request.method == "POST" else None
+    form_precios = AjustePreciosForm(request.POST if accion == "precios" else None)
+    form_stock = AjusteStockForm(request.POST if accion == "stock" else None, initial={"modo": "fijar"})
+
+    if accion == "precios" and form_precios.is_valid():
+        cat = form_precios.cleaned_data["categoria"]
+        qs = Producto.objects.filter(categoria=cat) if cat else Producto.objects.all()
+        n = ajustes.ajustar_precios(qs, form_precios.cleaned_data["porcentaje"])
+        messages.success(request, f"Precio ajustado en {n} producto(s).")
+        return redirect("tienda:panel_productos_masivo")
+
+    if accion == "stock" and form_stock.is_valid():
+        cantidades = form_stock.cleaned_data["lineas"]
+        ids = ajustes.resolver_productos(list(cantidades))
+        faltan = [ref for ref in cantidades if ref not in ids]
+        if faltan:
+            form_stock.add_error("lineas", f"No se encontraron: {', '.join(faltan)}")
+        else:
+            n = ajustes.ajustar_stock(
+                {ids[ref]: c for ref, c in cantidades.items()}, sumar=form_stock.cleaned_data["modo"] == "sumar"
+            )
+            messages.success(request, f"Stock actualizado en {n} producto(s).")
+            return redirect("tienda:panel_productos_masivo")
+
+    return render(request, "tienda/panel/productos_masivo.html", {
+        "form_precios": form_precios, "form_stock": form_stock,
+    })
+
+@staff_member_required
+def panel_productos_disponibilidad(request):
+    """Activa o desactiva los productos marcados en el listado."""
+    if request.method == "POST":
+        ids = [i for i in request.POST.getlist("ids") if i.isdigit()]
+        activar = request.POST.get("accion") == "activar"
+        n = ajustes.cambiar_disponibilidad(Producto.objects.filter(id__in=ids), activar)
+        if activar:
+            messages.success(request, f"{n} producto(s) activados (los que no tienen stock siguen inactivos).")
+        else:
+            messages.success(request, f"{n} producto(s) desactivados.")
+    siguiente = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(siguiente, allowed_hosts={request.get_host()}):
+        siguiente = "tienda:panel_productos"
+    return redirect(siguiente)
+
 @staff_member_required
 def panel_producto_editar(request, pk):
     p = get_object_or_404(Producto, pk=pk)
@@ -285,9 +327,31 @@ def panel_producto_eliminar(request, pk):
     return render(request, "tienda/panel/producto_eliminar.html", {"producto": producto})
 
 @staff_member_required
+@solo_lectura
 def panel_pedidos(request):
-    pedidos = Pedido.objects.select_related("usuario", "descuento").order_by("-creado")
-    return render(request, "tienda/panel/pedidos_list.html", {"pedidos": pedidos})
+    qs, f = filtrar_pedidos(request.GET, Pedido.objects.select_related("usuario", "descuento"))
+    pagina = paginar_keyset(qs, "-creado", cursor=request.GET.get("cursor"), por_pagina=PANEL_POR_PAGINA)
+    return render(request, "tienda/panel/pedidos_list.html", {
+        "pedidos": pagina.objetos, "pagina": pagina, "f": f, "estados": Pedido.ESTADOS,
+    })
+
+@staff_member_required
+@solo_lectura
+def panel_exportar_pedidos(request, formato):
+    if formato not in exportar.TIPOS:
+        raise Http404
+    qs, _ = filtrar_pedidos(request.GET)
+    # las filas se generan al enviar la respuesta, ya fuera de @solo_lectura
+    return exportar.respuesta("pedidos", formato, exportar.ENCABEZADO_PEDIDOS, exportar.filas_pedidos(fijar_base(qs)))
+
+@staff_member_required
+@solo_lectura
+def panel_exportar_productos(request, formato):
+    if formato not in exportar.TIPOS:
+        raise Http404
+    q = request.GET.get("q", "").strip()
+    qs = busqueda.buscar(Producto.objects.all(), q) if q else Producto.objects.all()
+    return exportar.respuesta("productos", formato, exportar.ENCABEZADO_PRODUCTOS, exportar.filas_productos(fijar_base(qs)))
 
 @staff_member_required
 def panel_producto_desactivar(request, pk):
@@ -297,8 +361,7 @@ def panel_producto_desactivar(request, pk):
     p = get_object_or_404(Producto, pk=pk)
 
     if request.method == "POST":
-        p.disponible = False
-        p.save()
+        ajustes.cambiar_disponibilidad(Producto.objects.filter(pk=p.pk), False)
         messages.success(
             request,
             f"El producto «{p.nombre}» fue desactivado. Ya no aparecerá en el catálogo."
@@ -309,12 +372,22 @@ def panel_producto_desactivar(request, pk):
     return render(request, "tienda/panel/producto_desactivar.html", {"producto": p})
 
 @staff_member_required
+@solo_lectura
 def panel_pedido_detalle(request, pk):
-    ped = get_object_or_404(Pedido.objects.prefetch_related("detalles__producto"), pk=pk)
+    ped = get_object_or_404(
+        Pedido.objects.select_related("usuario", "descuento").prefetch_related(
+            Prefetch("detalles", queryset=DetallePedido.objects.select_related("producto"))
+        ),
+        pk=pk,
+    )
     if request.method == "POST":
         form = PedidoEstadoForm(request.POST, instance=ped)
         if form.is_valid():
-            form.save()
+            # cambiar estado/cupón mueve el pedido en los resúmenes de ventas
+            with transaction.atomic():
+                antes = resumenes.huella_guardada(ped.pk)
+                form.save()
+                resumenes.actualizar_pedido(antes, ped)
             messages.success(request, "Pedido actualizado.")
             return redirect("tienda:panel_pedido_detalle", pk=pk)
     else:
@@ -322,9 +395,11 @@ def panel_pedido_detalle(request, pk):
     return render(request, "tienda/panel/pedido_detalle.html", {"pedido": ped, "form": form})
 
 
+@cache_anonima
+@solo_lectura
 def producto_detalle(request, pk):
     try:
-        p = Producto.objects.get(pk=pk)
+        p = Producto.objects.select_related("categoria").get(pk=pk)
     except Producto.DoesNotExist:
         # Si de verdad no existe, 404 normal
         raise Http404("Producto no encontrado")
@@ -333,10 +408,12 @@ def producto_detalle(request, pk):
         messages.error(request, "Este producto no está disponible por el momento.")
         return redirect("tienda:inicio")
 
-    return render(request, "tienda/producto_detalle.html", {"p": p})
+    # producto + categoría en una consulta; los relacionados, dos más (o ninguna, desde la caché)
+    return render(request, "tienda/producto_detalle.html", {"p": p, **relacionados.para_producto(p)})
 
 # --------- PANEL CATEGORÍAS ---------
 @staff_member_required
+@solo_lectura
 def panel_categorias(request):
     categorias = Categoria.objects.all().order_by("nombre")
     return render(request, "tienda/panel/categorias_list.html", {"categorias": categorias})
@@ -388,6 +465,7 @@ def panel_categoria_eliminar(request, pk):
 
 # --------- PANEL DESCUENTOS / CUPONES ---------
 @staff_member_required
+@solo_lectura
 def panel_descuentos(request):
     descuentos = Descuento.objects.all().order_by("-creado")
     return render(request, "tienda/panel/descuentos_list.html", {"descuentos": descuentos})
@@ -443,3 +521,29 @@ def panel_descuento_toggle(request, pk):
     # por si alguien entra por GET, lo mandamos a la lista:
     return redirect("tienda:panel_descuentos")
 
+
+
+# --------- PANEL MÉTRICAS ---------
+@staff_member_required
+def panel_metricas(request):
+    if not metricas.activas():
+        raise Http404("Las métricas están desactivadas (TIENDA_METRICAS).")
+    if request.method == "POST":
+        metricas.registro.reiniciar()
+        messages.success(request, "Métricas reiniciadas.")
+        return redirect("tienda:panel_metricas")
+    return render(request, "tienda/panel/metricas.html", {
+        "filas": metricas.registro.resumen(), "muestras": metricas.MUESTRAS,
+    })
+
+
+@never_cache
+def metricas_prometheus(request):
+    """Texto para Prometheus: staff logueado o `Authorization: Bearer <TIENDA_METRICAS_TOKEN>`."""
+    if not metricas.activas():
+        raise Http404
+    token = settings.TIENDA_METRICAS_TOKEN
+    enviado = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not (request.user.is_staff or (token and secrets.compare_digest(enviado, token))):
+        return HttpResponse("No autorizado.\n", status=403, content_type="text/plain")
+    return HttpResponse(metricas.registro.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,77 @@
+"""
+Versiones asíncronas de las vistas de lectura más visitadas (inicio, ficha de
+producto y carrito), para el perfil opcional ASGI (settings.TIENDA_ASGI; ver
+papeleria_ganbaru/gunicorn_asgi.py). El Procfile sirve con WSGI.
+
+Las consultas (página, facetas, relacionados) y los contadores de versión
+usan el ORM y la caché asíncronos. Siguen en un hilo con sync_to_async lo
+que toca la sesión (carrito, mensajes) y el render: la plantilla lee el
+usuario y evalúa el queryset perezoso de categorías solo si el fragmento
+no está en caché, cosas que no se pueden hacer dentro del event loop.
+Mientras un request espera, el proceso atiende a los demás.
+
+Mismo HTML, mismos filtros y misma caché de anónimos que views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import facetas, relacionados, versiones
+from .cache_paginas import cache_anonima
+from .cart import Cart
+from .filtros import buscar_catalogo, filtrar_catalogo
+from .models import Categoria, Producto
+from .paginacion import apaginar_keyset
+from .replicas import solo_lectura
+from .views import PRODUCTOS_POR_PAGINA, FRAGMENTOS_TTL
+
+arender = sync_to_async(render)
+
+
+# --------- HOME / CATÁLOGO ----------
+@cache_anonima
+@solo_lectura
+async def inicio(request):
+    qs, f = filtrar_catalogo(request.GET)
+    pagina = await apaginar_keyset(qs, f["orden"], cursor=request.GET.get("cursor"), por_pagina=PRODUCTOS_POR_PAGINA)
+    cache_v = await versiones.aversiones(versiones.CATALOGO, versiones.FACETAS)
+    conteos = await facetas.acalcular(
+        buscar_catalogo(f["q"]), f["cat"], f["ok"], f["dmin"], f["dmax"],
+        q=f["q"], version=cache_v[versiones.FACETAS],
+    )
+
+    return await arender(request, "tienda/index.html", {
+        "productos": pagina.objetos,
+        "pagina": pagina,
+        "categorias": Categoria.objects.all(),
+        "cat_seleccionada": f["cat"],
+        "facetas": conteos,
+        "cache_ttl": FRAGMENTOS_TTL,
+        "cache_v": cache_v,
+        "categorias_v": await versiones.acategorias(),
+        "f": f,
+    })
+
+
+@cache_anonima
+@solo_lectura
+async def producto_detalle(request, pk):
+    try:
+        p = await Producto.objects.select_related("categoria").aget(pk=pk)
+    except Producto.DoesNotExist:
+        raise Http404("Producto no encontrado")
+
+    if not p.disponible:
+        await sync_to_async(messages.error)(request, "Este producto no está disponible por el momento.")
+        return redirect("tienda:inicio")
+
+    bloques = await relacionados.apara_producto(p)
+    return await arender(request, "tienda/producto_detalle.html", {"p": p, **bloques})
+
+
+# --------- CARRITO ----------
+async def carrito_ver(request):
+    cart = await sync_to_async(Cart)(request)   # lee la sesión
+    items = await cart.aitems()
+    return await arender(request, "tienda/carrito.html", {"items": items, "total": cart.total()})